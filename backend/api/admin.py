@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+from .models import (FavoriteRecipe, Follow, ImageJob, Ingredient, Recipe,
                      RecipeIngredient, ShoppingCart, Tag)
 
 
@@ -12,11 +12,13 @@ class RecipeIngredientInline(admin.TabularInline):
 
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline,)
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
 
 
 admin.site.register(Follow)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(FavoriteRecipe)
+admin.site.register(ImageJob)
 admin.site.register(Ingredient)
 admin.site.register(RecipeIngredient)
 admin.site.register(ShoppingCart)
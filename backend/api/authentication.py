@@ -0,0 +1,60 @@
+"""Аутентификация по токену с кэшем.
+
+Токен и пользователь лежат в общем кэше под разными ключами, поэтому
+данные пользователя сбрасываются без поиска его токена. Сигналы из
+api/signals.py удаляют записи при выходе и удалении токена, а также при
+любом сохранении пользователя: смене пароля, деактивации, изменении
+счётчиков.
+"""
+from functools import partial
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_KEY = 'auth-token:{}'
+USER_KEY = 'auth-user:{}'
+
+
+def token_cache_key(key):
+    return TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def forget(cache_key):
+    """Удалить запись сейчас и ещё раз после фиксации транзакции."""
+
+    cache.delete(cache_key)
+    transaction.on_commit(partial(cache.delete, cache_key))
+
+
+def forget_token(key):
+    forget(token_cache_key(key))
+
+
+def forget_user(pk):
+    forget(USER_KEY.format(pk))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе, пока запись есть в кэше."""
+
+    def authenticate_credentials(self, key):
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if not timeout:
+            return super().authenticate_credentials(key)
+        token_key = token_cache_key(key)
+        token = cache.get(token_key)
+        user = token and cache.get(USER_KEY.format(token.user_id))
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token = Token(
+                key=token.key, user_id=token.user_id, created=token.created
+            )
+            cache.set_many(
+                {token_key: token, USER_KEY.format(user.pk): user}, timeout
+            )
+        token.user = user
+        return user, token
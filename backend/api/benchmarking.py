@@ -0,0 +1,8 @@
+"""Общие расчёты для команд замеров benchmark_asgi и loadtest."""
+
+
+def percentile(values, share):
+    """Значение, ниже которого лежит доля share отсортированных values."""
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
@@ -0,0 +1,50 @@
+"""Кэш ответов для анонимных пользователей.
+
+Ключ строится из адреса, нормализованных параметров запроса и версий
+данных, попавших в ответ. Запись в связанные модели меняет версию, и
+старые ответы больше не находятся. Счётчики попаданий и промахов
+лежат в том же кэше и выводятся командой manage.py cache_stats.
+"""
+from hashlib import md5
+
+from django.core.cache import cache
+
+from .versions import get_versions
+
+RESPONSE_KEY = 'response:{}'
+STATS_KEY = 'response-cache:{}'
+HIT = 'hit'
+MISS = 'miss'
+
+
+def response_cache_key(request, view_name, versions):
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    raw = '|'.join((
+        view_name,
+        request.build_absolute_uri(request.path),
+        repr(params),
+        *get_versions(*versions),
+    ))
+    return RESPONSE_KEY.format(md5(raw.encode()).hexdigest())
+
+
+def record(result):
+    key = STATS_KEY.format(result)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    keys = {result: STATS_KEY.format(result) for result in (HIT, MISS)}
+    values = cache.get_many(keys.values())
+    return {result: values.get(key, 0) for result, key in keys.items()}
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(result) for result in (HIT, MISS)])
@@ -0,0 +1,275 @@
+"""Материализованный список покупок.
+
+Строки ShoppingListItem хранят сумму каждого ингредиента по всем рецептам
+корзины, поэтому выгрузка и сводка читают готовые строки без агрегации.
+Добавление и удаление рецепта из корзины прибавляет или вычитает его
+ингредиенты; после правки или удаления рецепта затронутые строки
+пересчитываются по корзинам. Совместимые единицы складываются: килограммы
+переводятся в граммы, литры — в миллилитры.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Sum
+
+from .deletion import is_deleting
+from .models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+# Единица измерения: (единица в списке покупок, множитель).
+UNITS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'шт': ('шт', 1),
+    'шт.': ('шт', 1),
+}
+
+# Пересчёты, отложенные до конца блока collect_changes():
+# {(рецепт, база): id ингредиентов или None, если пересчитать всё}.
+pending = ContextVar('pending', default=None)
+# Списки покупок после удаления рецептов: {база: (список колбэков
+# соединения, пользователи корзин, ингредиенты удалённых рецептов)}.
+deleted = ContextVar('deleted', default=None)
+
+
+def normalize(unit, amount):
+    """Единица списка покупок и количество в ней: 2 кг -> (г, 2000)."""
+
+    base, factor = UNITS.get(unit.strip().lower(), (unit, 1))
+    return base, amount * factor
+
+
+def fold(rows):
+    """Сложить строки (..., название, единица, количество) по единицам."""
+
+    lines = defaultdict(int)
+    for *key, unit, amount in rows:
+        unit, amount = normalize(unit, amount)
+        lines[(*key, unit)] += amount
+    return lines
+
+
+def lock_users(user_ids, using):
+    """Заблокировать строки пользователей до конца транзакции.
+
+    Так одновременные изменения корзины одного пользователя не создают
+    одну и ту же строку списка дважды.
+    """
+
+    list(
+        User.objects.using(using).select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def add_recipes(user_id, recipe_ids, sign, using):
+    """Прибавить (sign=1) или вычесть (sign=-1) ингредиенты рецептов."""
+
+    lines = fold(
+        RecipeIngredient.objects.using(using).filter(
+            recipe_id__in=recipe_ids
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+    )
+    if not lines:
+        return
+    with transaction.atomic(using=using):
+        lock_users([user_id], using)
+        items = {
+            (item.name, item.measurement_unit): item
+            for item in ShoppingListItem.objects.using(using).filter(
+                user_id=user_id, name__in={name for name, _ in lines}
+            )
+        }
+        changed, emptied, added = [], [], []
+        for (name, unit), amount in lines.items():
+            item = items.get((name, unit))
+            if item is not None:
+                item.amount = max(item.amount + sign * amount, 0)
+                if item.amount:
+                    changed.append(item)
+                else:
+                    emptied.append(item.pk)
+            elif sign > 0:
+                added.append(ShoppingListItem(
+                    user_id=user_id, name=name, measurement_unit=unit,
+                    amount=amount,
+                ))
+        if changed:
+            ShoppingListItem.objects.using(using).bulk_update(
+                changed, ['amount']
+            )
+        if emptied:
+            ShoppingListItem.objects.using(using).filter(
+                pk__in=emptied
+            ).delete()
+        if added:
+            ShoppingListItem.objects.using(using).bulk_create(added)
+
+
+def rebuild(user_ids, using, ingredient_ids=None, names=None):
+    """Пересчитать списки покупок пользователей по их корзинам.
+
+    Если переданы ingredient_ids или names, пересчитываются только строки
+    с названиями этих ингредиентов или с этими названиями.
+    """
+
+    user_ids = list(user_ids)
+    if ingredient_ids is not None:
+        names = list(
+            Ingredient.objects.using(using).filter(
+                pk__in=ingredient_ids
+            ).values_list('name', flat=True).distinct()
+        )
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        rebuild_batch(user_ids[start:start + BATCH_SIZE], using, names)
+
+
+def rebuild_batch(user_ids, using, names):
+    items = ShoppingListItem.objects.using(using).filter(
+        user_id__in=user_ids
+    )
+    sources = RecipeIngredient.objects.using(using).filter(
+        recipe__shopping_list__user_id__in=user_ids
+    )
+    if names is not None:
+        items = items.filter(name__in=names)
+        sources = sources.filter(ingredient__name__in=names)
+    with transaction.atomic(using=using):
+        lock_users(user_ids, using)
+        items.delete()
+        lines = fold(
+            sources.order_by().values_list(
+                'recipe__shopping_list__user_id', 'ingredient__name',
+                'ingredient__measurement_unit'
+            ).annotate(total=Sum('amount')).iterator()
+        )
+        ShoppingListItem.objects.using(using).bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, name=name, measurement_unit=unit,
+                    amount=amount,
+                )
+                for (user_id, name, unit), amount in lines.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def cart_users(using, **filters):
+    return ShoppingCart.objects.using(using).filter(
+        **filters
+    ).order_by().values_list('user_id', flat=True).distinct()
+
+
+def cart_changed(cart, sign, using):
+    """Рецепт добавлен в корзину или убран из неё."""
+
+    # Каскадное удаление корзин не пересчитывает списки построчно.
+    if is_deleting(User, cart.user_id):
+        return
+    if is_deleting(Recipe, cart.recipe_id):
+        deleted_recipes(using)[0].add(cart.user_id)
+        return
+    add_recipes(cart.user_id, [cart.recipe_id], sign, using)
+
+
+def rebuild_for_recipe(recipe_id, using, ingredient_ids=None):
+    """Пересчитать списки покупок, в корзинах которых есть рецепт."""
+
+    if is_deleting(Recipe, recipe_id):
+        deleted_recipes(using)[1].update(ingredient_ids or ())
+        return
+    changes = pending.get()
+    if changes is None:
+        rebuild(cart_users(using, recipe_id=recipe_id), using, ingredient_ids)
+        return
+    key = recipe_id, using
+    if ingredient_ids is None or changes.get(key, set()) is None:
+        changes[key] = None
+    else:
+        changes[key] = changes.get(key, set()) | set(ingredient_ids)
+
+
+@contextmanager
+def collect_changes():
+    """Выполнить пересчёты блока одним вызовом на рецепт в его конце."""
+
+    changes = {}
+    token = pending.set(changes)
+    try:
+        yield
+    finally:
+        pending.reset(token)
+    for (recipe_id, using), ingredient_ids in changes.items():
+        rebuild_for_recipe(recipe_id, using, ingredient_ids)
+
+
+def remember_ingredient(ingredient, using):
+    """Запомнить перед сохранением название и единицу ингредиента в базе."""
+
+    ingredient._saved_as = Ingredient.objects.using(using).filter(
+        pk=ingredient.pk
+    ).values_list('name', 'measurement_unit').first()
+
+
+def rebuild_for_ingredient(ingredient, using):
+    """Пересчитать списки покупок после правки ингредиента.
+
+    Если название и единица не изменились, списки не трогаются; иначе
+    пересчитываются только строки со старым и новым названием.
+    """
+
+    saved_as = getattr(ingredient, '_saved_as', None)
+    current = ingredient.name, ingredient.measurement_unit
+    if saved_as == current:
+        return
+    ingredient._saved_as = current
+    rebuild(
+        cart_users(
+            using, recipe__recipeingredients__ingredient_id=ingredient.pk
+        ),
+        using,
+        names=None if saved_as is None else {saved_as[0], current[0]},
+    )
+
+
+def deleted_recipes(using):
+    """Пользователи и ингредиенты рецептов, удаляемых в транзакции.
+
+    Каскад удаляет корзины и ингредиенты рецептов построчно с сигналами;
+    по ним собираются пользователи и ингредиенты всех удаляемых рецептов,
+    а их списки пересчитываются одним rebuild после фиксации.
+    """
+
+    hooks = connections[using].run_on_commit
+    marks = deleted.get() or {}
+    if using in marks and marks[using][0] is hooks:
+        return marks[using][1:]
+    users, ingredient_ids = set(), set()
+    deleted.set({**marks, using: (hooks, users, ingredient_ids)})
+    transaction.on_commit(
+        partial(rebuild_deleted, users, ingredient_ids, using), using=using
+    )
+    return users, ingredient_ids
+
+
+def rebuild_deleted(users, ingredient_ids, using):
+    marks = deleted.get() or {}
+    if using in marks and marks[using][1] is users:
+        deleted.set({
+            key: mark for key, mark in marks.items() if key != using
+        })
+    if users:
+        rebuild(users, using, ingredient_ids)
@@ -0,0 +1,99 @@
+"""Счётчики избранного, списков покупок, рецептов и подписчиков.
+
+Счётчики хранятся в столбцах моделей и меняются одним UPDATE с F()
+при создании и удалении строк. При удалении пользователя счётчики его
+избранного, корзины и подписок уменьшаются заранее одним UPDATE на
+счётчик, а каскад строк их уже не трогает. Расхождения после массовых
+операций исправляет manage.py recount.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .deletion import is_deleting
+from .models import FavoriteRecipe, Follow, Recipe, ShoppingCart
+
+User = get_user_model()
+
+COUNTERS = {
+    FavoriteRecipe: ('recipe', 'favorites_count'),
+    ShoppingCart: ('recipe', 'in_carts_count'),
+    Recipe: ('author', 'recipes_count'),
+    Follow: ('author', 'followers_count'),
+}
+# Тем же UPDATE рецепт ставится в очередь пересчёта популярности.
+MARKS = {
+    FavoriteRecipe: {'popularity_stale': True},
+    ShoppingCart: {'popularity_stale': True},
+}
+
+
+def counted_model(sender):
+    relation, field = COUNTERS[sender]
+    return sender._meta.get_field(relation).related_model, relation, field
+
+
+def update_counter(sender, instance, delta, using):
+    """Изменить счётчик связанной строки на delta, не опускаясь ниже 0."""
+
+    _, relation, _ = counted_model(sender)
+    update_counters(
+        sender, [getattr(instance, f'{relation}_id')], delta, using
+    )
+
+
+def update_counters(sender, pks, delta, using):
+    """То же для нескольких строк одним UPDATE, например после bulk_create."""
+
+    model, relation, field = counted_model(sender)
+    model.objects.using(using).filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}, **MARKS.get(sender, {})
+    )
+
+
+def uncount_user_rows(user_id, using):
+    """Уменьшить счётчики строк удаляемого пользователя до каскада."""
+
+    for sender in (FavoriteRecipe, ShoppingCart, Follow):
+        model, relation, field = counted_model(sender)
+        model.objects.using(using).filter(
+            pk__in=sender.objects.filter(user_id=user_id).values(relation)
+        ).update(
+            **{field: Greatest(F(field) - 1, 0)}, **MARKS.get(sender, {})
+        )
+
+
+def counted_by_cascade(sender, instance):
+    """Счётчик не меняется при удалении строки каскадом.
+
+    Либо удаляется сама строка со счётчиком, либо владелец строки и
+    счётчик уже уменьшен uncount_user_rows.
+    """
+
+    model, relation, _ = counted_model(sender)
+    return is_deleting(model, getattr(instance, f'{relation}_id')) or (
+        sender is not Recipe and is_deleting(User, instance.user_id)
+    )
+
+
+def recount(using='default'):
+    """Пересчитать все счётчики; вернуть число исправленных строк."""
+
+    fixed = {}
+    for sender in COUNTERS:
+        model, relation, field = counted_model(sender)
+        actual = Coalesce(
+            Subquery(
+                sender.objects.filter(
+                    **{relation: OuterRef('pk')}
+                ).order_by().values(relation).annotate(
+                    total=Count('pk')
+                ).values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+        fixed[f'{model._meta.model_name}.{field}'] = model.objects.using(
+            using
+        ).exclude(**{field: actual}).update(**{field: actual})
+    return fixed
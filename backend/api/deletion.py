@@ -0,0 +1,55 @@
+"""Отметки рецептов и пользователей, которые сейчас удаляются.
+
+pre_delete ставит отметку, post_delete снимает её, а обработчики каскада
+по отметке пропускают построчную работу: пересчёт списков покупок,
+раскладку лент. Если удаление падает, post_delete не вызывается, поэтому
+отметка привязана к транзакции удаления и перестаёт действовать, как
+только транзакция зафиксирована или откачена, в том числе до точки
+сохранения.
+
+Признак той же транзакции — список on_commit-колбэков соединения: Django
+заменяет его новым при фиксации, откате и откате точки сохранения.
+"""
+from contextvars import ContextVar
+
+from django.db import connections
+
+# {(модель, pk): (база, список колбэков соединения при постановке)}.
+deleting = ContextVar('deleting', default=None)
+
+
+def is_live(using, hooks):
+    connection = connections[using]
+    return (
+        connection.in_atomic_block
+        and not connection.needs_rollback
+        and connection.run_on_commit is hooks
+    )
+
+
+def live_marks():
+    return {
+        key: mark for key, mark in (deleting.get() or {}).items()
+        if is_live(*mark)
+    }
+
+
+def start_deleting(model, pk, using):
+    """Отметить строку до каскада; устаревшие отметки отбрасываются."""
+
+    marks = live_marks()
+    marks[model, pk] = using, connections[using].run_on_commit
+    deleting.set(marks)
+
+
+def finish_deleting(model, pk):
+    marks = dict(deleting.get() or {})
+    marks.pop((model, pk), None)
+    deleting.set(marks)
+
+
+def is_deleting(model, pk):
+    """Удаляется ли строка в текущей транзакции."""
+
+    mark = (deleting.get() or {}).get((model, pk))
+    return mark is not None and is_live(*mark)
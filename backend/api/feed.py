@@ -0,0 +1,189 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Новый рецепт сразу записывается в ленты подписчиков автора (FeedEntry),
+поэтому лента читается одним запросом по индексу (user, recipe). Рецепты
+авторов, у которых FEED_FANOUT_LIMIT подписчиков и больше, по лентам не
+раскладываются, а подмешиваются при чтении. В ленте хранятся не больше
+FEED_LENGTH последних рецептов: лишние удаляются при записи в ленту, так что
+чтение ленты ничего не пишет.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (Case, Exists, IntegerField, OuterRef, Q,
+                              Subquery, When)
+
+from .models import FeedEntry, Follow, Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def push_recipe(recipe, using):
+    """Записать новый рецепт в ленты подписчиков автора."""
+
+    followers_count = User.objects.using(using).filter(
+        pk=recipe.author_id
+    ).values_list('followers_count', flat=True).first()
+    if not followers_count or followers_count >= settings.FEED_FANOUT_LIMIT:
+        return
+    followers = list(
+        Follow.objects.using(using).filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True)
+    )
+    for start in range(0, len(followers), BATCH_SIZE):
+        user_ids = followers[start:start + BATCH_SIZE]
+        FeedEntry.objects.using(using).bulk_create(
+            [FeedEntry(user_id=user_id, recipe_id=recipe.pk)
+             for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        trim(user_ids, using)
+
+
+def refill_authors(author_ids, using):
+    """Разложить рецепты авторов по лентам, когда подписчиков стало меньше.
+
+    Пока у автора было FEED_FANOUT_LIMIT подписчиков, его рецепты
+    подмешивались при чтении и в ленты не записывались. Когда после отписки
+    или удаления подписчика их становится на одного меньше, последние
+    FEED_LENGTH рецептов автора записываются в ленты оставшихся подписчиков.
+    Запись идёт после фиксации транзакции отписки пачками не больше
+    BATCH_SIZE строк, каждая в своей транзакции, чтобы отписка не ждала
+    записи в тысячи лент.
+    """
+
+    if author_ids:
+        transaction.on_commit(
+            partial(push_authors, list(author_ids), using), using=using
+        )
+
+
+def push_authors(author_ids, using):
+    for author_id in list(
+        User.objects.using(using).filter(
+            pk__in=author_ids,
+            followers_count=settings.FEED_FANOUT_LIMIT - 1,
+        ).values_list('pk', flat=True)
+    ):
+        push_author(author_id, using)
+
+
+def push_author(author_id, using):
+    recipe_ids = list(
+        Recipe.objects.using(using).filter(
+            author_id=author_id
+        ).order_by('-id').values_list('id', flat=True)[:settings.FEED_LENGTH]
+    )
+    if not recipe_ids:
+        return
+    followers = list(
+        Follow.objects.using(using).filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+    step = max(BATCH_SIZE // len(recipe_ids), 1)
+    for start in range(0, len(followers), step):
+        user_ids = followers[start:start + step]
+        with transaction.atomic(using=using):
+            FeedEntry.objects.using(using).bulk_create(
+                [FeedEntry(user_id=user_id, recipe_id=recipe_id)
+                 for user_id in user_ids for recipe_id in recipe_ids],
+                ignore_conflicts=True,
+            )
+            trim(user_ids, using)
+
+
+def backfill(follow, using):
+    """Добавить в ленту последние рецепты автора после подписки."""
+
+    recipe_ids = Recipe.objects.using(using).filter(
+        author_id=follow.author_id
+    ).order_by('-id').values_list('id', flat=True)[:settings.FEED_LENGTH]
+    FeedEntry.objects.using(using).bulk_create(
+        (FeedEntry(user_id=follow.user_id, recipe_id=recipe_id)
+         for recipe_id in recipe_ids),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim([follow.user_id], using)
+
+
+def followed_authors(user_id, using):
+    return list(
+        Follow.objects.using(using).filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)
+    )
+
+
+def forget_author(follow, using):
+    """Убрать из ленты рецепты автора после отписки."""
+
+    FeedEntry.objects.using(using).filter(
+        user_id=follow.user_id, recipe__author_id=follow.author_id
+    ).delete()
+
+
+def trim(user_ids, using):
+    """Оставить в лентах user_ids FEED_LENGTH последних рецептов.
+
+    Первый запрос находит у переполненных лент id первого лишнего рецепта,
+    второй одним DELETE удаляет его и всё, что старше.
+    """
+
+    cutoffs = dict(User.objects.using(using).filter(pk__in=user_ids).annotate(
+        cutoff=Subquery(
+            FeedEntry.objects.filter(
+                user_id=OuterRef('pk')
+            ).order_by('-recipe_id').values('recipe_id')[
+                settings.FEED_LENGTH:settings.FEED_LENGTH + 1
+            ]
+        )
+    ).filter(cutoff__isnull=False).values_list('pk', 'cutoff'))
+    if not cutoffs:
+        return
+    FeedEntry.objects.using(using).filter(
+        user_id__in=list(cutoffs),
+        recipe_id__lte=Case(
+            *(When(user_id=pk, then=cutoff)
+              for pk, cutoff in cutoffs.items()),
+            output_field=IntegerField(),
+        ),
+    ).delete()
+
+
+def rebuild_feed(user_id, using):
+    """Собрать ленту заново по подпискам, например после bulk_create."""
+
+    FeedEntry.objects.using(using).filter(user_id=user_id).delete()
+    recipe_ids = Recipe.objects.using(using).filter(
+        author__following__user_id=user_id,
+        author__followers_count__lt=settings.FEED_FANOUT_LIMIT,
+    ).order_by('-id').values_list('id', flat=True)[:settings.FEED_LENGTH]
+    FeedEntry.objects.using(using).bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for recipe_id in recipe_ids),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def feed_queryset(queryset, user):
+    """Рецепты ленты user из queryset рецептов."""
+
+    popular = list(
+        Follow.objects.filter(
+            user=user,
+            author__followers_count__gte=settings.FEED_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+    if not popular:
+        return queryset.filter(feed_entries__user=user)
+    return queryset.filter(
+        Q(Exists(FeedEntry.objects.filter(user=user, recipe=OuterRef('pk'))))
+        | Q(author__in=popular)
+    )
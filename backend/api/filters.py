@@ -1,15 +1,10 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
 
-from .models import Ingredient, Recipe, Tag
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+from .models import Recipe, Tag
+from .search import search_recipes
 
 
 class RecipeFilter(FilterSet):
@@ -17,15 +12,33 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним тегом: EXISTS вместо JOIN и DISTINCT."""
+
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__in=[tag.pk for tag in value],
+                )
+            )
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -35,3 +48,51 @@ class RecipeFilter(FilterSet):
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_list__user=self.request.user)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
+
+class RecipeOrderingFilter(BaseFilterBackend):
+    """Сортировка ?ordering=popular|new|cooking_time.
+
+    У каждого варианта есть индекс, а id в конце делает порядок
+    однозначным. get_ordering читает и постраничный вывод по курсору.
+    """
+
+    ordering_param = 'ordering'
+    orderings = {
+        'popular': ('-popularity', '-id'),
+        'new': ('-id',),
+        'cooking_time': ('cooking_time', '-id'),
+    }
+    default = 'new'
+
+    def get_ordering(self, request, queryset, view):
+        value = request.query_params.get(self.ordering_param, self.default)
+        if value not in self.orderings:
+            raise ValidationError({
+                self.ordering_param: 'Допустимые значения: {}'.format(
+                    ', '.join(self.orderings)
+                )
+            })
+        return self.orderings[value]
+
+    def filter_queryset(self, request, queryset, view):
+        if self.ordering_param not in request.query_params:
+            return queryset
+        return queryset.order_by(
+            *self.get_ordering(request, queryset, view)
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.ordering_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Сортировка. По умолчанию new.',
+            'schema': {'type': 'string', 'enum': list(self.orderings)},
+        }]
@@ -0,0 +1,140 @@
+"""Превью и WebP-версии изображений рецептов.
+
+Запрос только сохраняет оригинал и ставит задачу в очередь в базе
+данных. Нарезку выполняет отдельный процесс: manage.py process_images.
+"""
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .models import ImageJob, Recipe
+from .versions import RECIPES, bump_version, recipe_version
+
+VARIANTS_DIR = 'recipes/variants'
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (640, 640),
+}
+FORMATS = (
+    ('', 'JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+    ('_webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+)
+VARIANT_KEYS = tuple(
+    f'{name}{suffix}' for name in VARIANTS for suffix, *_ in FORMATS
+)
+MAX_ATTEMPTS = 3
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def enqueue_image(recipe, using, created=False):
+    """Поставить изображение рецепта в очередь, если оно сменилось."""
+
+    source = recipe.image.name if recipe.image else ''
+    if not source or source == recipe.image_variants.get('source'):
+        return
+    jobs = ImageJob.objects.using(using)
+    if not created:
+        jobs.filter(recipe=recipe).delete()
+    jobs.create(recipe=recipe, source=source)
+
+
+def get_variant_urls(recipe, request=None):
+    """Ссылки на варианты; пока они не готовы, ссылки ведут на оригинал."""
+
+    if not recipe.image:
+        return dict.fromkeys(VARIANT_KEYS)
+    variants = recipe.image_variants
+    if variants.get('source') != recipe.image.name:
+        variants = {}
+    storage = recipe.image.storage
+    urls = {}
+    for key in VARIANT_KEYS:
+        url = storage.url(variants.get(key, recipe.image.name))
+        urls[key] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def convert(image, mode):
+    if mode == 'RGB' and image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+        return background
+    return image.convert(mode)
+
+
+def render_variants(storage, source):
+    """Нарезать варианты изображения и сохранить их в хранилище."""
+
+    with storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    stem = PurePosixPath(source).stem
+    variants = {'source': source}
+    for name, size in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for suffix, image_format, extension, options in FORMATS:
+            mode = 'RGBA' if has_alpha and image_format == 'WEBP' else 'RGB'
+            buffer = BytesIO()
+            convert(resized, mode).save(buffer, image_format, **options)
+            variants[f'{name}{suffix}'] = storage.save(
+                f'{VARIANTS_DIR}/{stem}_{name}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def delete_variants(storage, variants):
+    for key in VARIANT_KEYS:
+        if variants.get(key):
+            storage.delete(variants[key])
+
+
+def process_job(job):
+    """Обработать задачу; устаревшие файлы удаляются после коммита.
+
+    Update() не вызывает сигналы, поэтому версии рецепта меняются здесь:
+    закэшированные ответы со старыми ссылками на превью устаревают.
+    """
+
+    storage = Recipe._meta.get_field('image').storage
+    old_variants = job.recipe.image_variants
+    variants = render_variants(storage, job.source)
+    updated = Recipe.objects.filter(
+        pk=job.recipe_id, image=job.source
+    ).update(image_variants=variants)
+    stale = old_variants if updated else variants
+    if updated:
+        bump_version(RECIPES, recipe_version(job.recipe_id))
+    transaction.on_commit(lambda: delete_variants(storage, stale))
+
+
+def process_next():
+    """Обработать одну задачу из очереди; False, если очередь пуста.
+
+    На PostgreSQL задача блокируется через SKIP LOCKED, поэтому
+    несколько воркеров не возьмут одну и ту же задачу, а запрос,
+    сменивший изображение, ждёт не дольше обработки одного файла.
+    """
+
+    with transaction.atomic():
+        job = ImageJob.objects.select_for_update(
+            skip_locked=True, of=('self',)
+        ).select_related('recipe').filter(
+            attempts__lt=MAX_ATTEMPTS
+        ).first()
+        if job is None:
+            return False
+        try:
+            process_job(job)
+        except IMAGE_ERRORS as error:
+            job.attempts += 1
+            job.error = str(error)
+            job.save(update_fields=['attempts', 'error'])
+        else:
+            job.delete()
+    return True
@@ -0,0 +1,169 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from statistics import median
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from api.benchmarking import percentile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = {
+    'wsgi': ('foodgram.wsgi', [], 'false'),
+    'asgi': (
+        'foodgram.asgi', ['-k', 'uvicorn.workers.UvicornWorker'], 'true'
+    ),
+}
+DEFAULT_PATHS = (
+    '/api/ingredients/?name=а',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/download_shopping_cart/?format=pdf',
+)
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        ' Сравнить пропускную способность gunicorn с синхронными воркерами '
+        'и с воркерами uvicorn (ASGI) на одних и тех же запросах '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes',
+            nargs='+',
+            choices=MODES,
+            default=list(MODES),
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Число процессов gunicorn в каждом режиме',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Число одновременных запросов',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=300,
+            help='Число запросов к каждому адресу',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Адрес для нагрузки; {recipe} заменяется на --recipe',
+        )
+        parser.add_argument('--recipe', type=int, default=1)
+        parser.add_argument(
+            '--token',
+            default='',
+            help='Токен пользователя со списком покупок',
+        )
+
+    @contextmanager
+    def server(self, mode, workers):
+        app, worker_args, async_views = MODES[mode]
+        port = free_port()
+        env = {**os.environ, 'ASYNC_VIEWS': async_views}
+        process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', app,
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers),
+                *worker_args,
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://localhost:{port}'
+        try:
+            self.wait_ready(process, base_url)
+            yield base_url
+        finally:
+            process.terminate()
+            process.wait()
+
+    def wait_ready(self, process, base_url):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Сервер завершился при запуске')
+            try:
+                urlopen(f'{base_url}/api/', timeout=1)
+                return
+            except HTTPError:
+                return
+            except (URLError, OSError):
+                time.sleep(0.2)
+        raise CommandError('Сервер не ответил за отведённое время')
+
+    def fetch(self, url, headers):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers), timeout=60) as reply:
+                reply.read()
+                ok = reply.status < 400
+        except (HTTPError, URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def load(self, url, headers, options):
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            started = time.perf_counter()
+            results = list(executor.map(
+                lambda _: self.fetch(url, headers),
+                range(options['requests'])
+            ))
+            elapsed = time.perf_counter() - started
+        durations = [duration for duration, _ in results]
+        return {
+            'rps': len(results) / elapsed,
+            'p50': median(durations) * 1000,
+            'p95': percentile(durations, 0.95) * 1000,
+            'errors': sum(not ok for _, ok in results),
+        }
+
+    def handle(self, *args, **options):
+        paths = [
+            quote(path.format(recipe=options['recipe']), safe='/?=&')
+            for path in options['paths'] or DEFAULT_PATHS
+        ]
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        self.stdout.write(
+            f'{"режим":<6} {"адрес":<50} {"запр/с":>8} '
+            f'{"p50, мс":>9} {"p95, мс":>9} {"ошибки":>7}'
+        )
+        for mode in options['modes']:
+            with self.server(mode, options['workers']) as base_url:
+                for path in paths:
+                    self.fetch(f'{base_url}{path}', headers)
+                    result = self.load(
+                        f'{base_url}{path}', headers, options
+                    )
+                    self.stdout.write(
+                        f'{mode:<6} {path:<50} {result["rps"]:>8.1f} '
+                        f'{result["p50"]:>9.1f} {result["p95"]:>9.1f} '
+                        f'{result["errors"]:>7}'
+                    )
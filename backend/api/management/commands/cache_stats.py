@@ -0,0 +1,25 @@
+from api.caching import HIT, MISS, get_stats, reset_stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ' Показать попадания и промахи кэша ответов для анонимов '
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats[HIT] + stats[MISS]
+        ratio = stats[HIT] / total if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats[HIT]}, промахов: {stats[MISS]}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены'))
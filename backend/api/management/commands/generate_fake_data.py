@@ -0,0 +1,273 @@
+import random
+from io import BytesIO
+from itertools import accumulate, islice
+from time import perf_counter
+
+from api.cart import cart_users, rebuild
+from api.counters import recount
+from api.feed import rebuild_feed
+from api.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                        RecipeIngredient, ShoppingCart, Tag)
+from api.popularity import mark_all, update_stale
+from api.search import update_recipes_search
+from api.versions import AUTHORS, RECIPES, bump_version
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from PIL import Image
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+PASSWORD = 'password'
+IMAGE_NAME = 'recipes/images/fake.jpg'
+WORDS = (
+    'суп', 'салат', 'пирог', 'запеканка', 'каша', 'омлет', 'рагу',
+    'паста', 'блины', 'котлеты', 'плов', 'борщ', 'сырники', 'соус',
+    'домашний', 'быстрый', 'острый', 'летний', 'сырный', 'овощной',
+    'куриный', 'грибной', 'сладкий', 'постный', 'бабушкин', 'праздничный',
+)
+
+
+def zipf_cum_weights(count, skew):
+    """Накопленные веса Ципфа: первые элементы намного популярнее."""
+
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        ' Заполнить базу синтетическими пользователями, рецептами, '
+        'избранным, списками покупок и подписками для нагрузочных тестов '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=8,
+            help='Среднее число ингредиентов в рецепте',
+        )
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа: чем больше, тем сильнее '
+                 'выделяются популярные авторы и рецепты',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Число строк в одном bulk_create',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Нет ингредиентов или тегов: сначала manage.py import_csv'
+            )
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        started = perf_counter()
+        self.stdout.write(self.style.WARNING('Старт команды'))
+
+        user_ids = self.create_users(options['users'])
+        if not user_ids:
+            raise CommandError('Нужен хотя бы один пользователь')
+        first_recipe_id, recipe_ids = self.create_recipes(
+            options['recipes'], user_ids
+        )
+        self.fill_recipes(
+            recipe_ids, ingredient_ids, tag_ids, options['ingredients']
+        )
+        for model, total in (
+            (FavoriteRecipe, options['favorites']),
+            (ShoppingCart, options['carts']),
+        ):
+            self.create_pairs(
+                model, 'recipe', total, user_ids, self.popular(recipe_ids)
+            )
+        self.create_pairs(
+            Follow, 'author', options['follows'], user_ids, self.authors
+        )
+
+        self.stdout.write('Пересчёт счётчиков и поискового индекса')
+        recount(DEFAULT_DB_ALIAS)
+        update_recipes_search(DEFAULT_DB_ALIAS, first_recipe_id)
+        self.stdout.write('Сборка лент подписок')
+        followers = Follow.objects.order_by().values_list(
+            'user_id', flat=True
+        ).distinct()
+        for user_id in followers.iterator():
+            rebuild_feed(user_id, DEFAULT_DB_ALIAS)
+        self.stdout.write('Сборка списков покупок')
+        rebuild(cart_users(DEFAULT_DB_ALIAS), DEFAULT_DB_ALIAS)
+        self.stdout.write('Пересчёт популярности')
+        mark_all(DEFAULT_DB_ALIAS)
+        while update_stale(DEFAULT_DB_ALIAS):
+            pass
+        bump_version(RECIPES, AUTHORS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {perf_counter() - started:.0f} с'
+        ))
+
+    def popular(self, ids):
+        """Id в случайном порядке и веса, по которым их выбирать."""
+
+        ids = list(ids)
+        self.rng.shuffle(ids)
+        return ids, zipf_cum_weights(len(ids), self.skew)
+
+    def draw(self, popular, total):
+        """total id по весам, выбранных пачками: так быстрее, чем по одному."""
+
+        ids, weights = popular
+        for start in range(0, total, self.batch_size):
+            yield from self.rng.choices(
+                ids, cum_weights=weights,
+                k=min(self.batch_size, total - start)
+            )
+
+    def insert(self, model, rows, total, label=None):
+        """Записать строки пачками; дубликаты пропускаются базой."""
+
+        label = label or model._meta.verbose_name_plural
+        done = 0
+        started = perf_counter()
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(
+                batch, batch_size=len(batch), ignore_conflicts=True
+            )
+            done += len(batch)
+            self.stdout.write(
+                f'{label}: {done}/{total}, '
+                f'{done / (perf_counter() - started):.0f} строк/с'
+            )
+
+    def new_ids(self, model, first_id):
+        return list(
+            model.objects.filter(pk__gte=first_id).order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def next_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return (last.first() or 0) + 1
+
+    def create_users(self, total):
+        first_id = self.next_id(User)
+        password = make_password(PASSWORD)
+        rows = (
+            User(
+                username=f'fake{first_id + number}',
+                email=f'fake{first_id + number}@example.com',
+                first_name='Пользователь',
+                last_name=str(first_id + number),
+                password=password,
+            )
+            for number in range(total)
+        )
+        self.insert(User, rows, total)
+        return self.new_ids(User, first_id) or list(
+            User.objects.values_list('pk', flat=True)
+        )
+
+    def image(self):
+        storage = Recipe._meta.get_field('image').storage
+        if not storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.new('RGB', (640, 480), '#E2A563').save(buffer, 'JPEG')
+            storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, total, user_ids):
+        first_id = self.next_id(Recipe)
+        # Самые плодовитые авторы потом получают и больше подписчиков.
+        self.authors = self.popular(user_ids)
+        image = self.image()
+        rng = self.rng
+
+        def rows():
+            for author_id in self.draw(self.authors, total):
+                yield Recipe(
+                    author_id=author_id,
+                    name=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                    text=' '.join(rng.choices(WORDS, k=40)).capitalize(),
+                    cooking_time=min(
+                        600, max(1, int(rng.lognormvariate(3.3, 0.6)))
+                    ),
+                    image=image,
+                )
+
+        self.insert(Recipe, rows(), total)
+        return first_id, self.new_ids(Recipe, first_id)
+
+    def fill_recipes(self, recipe_ids, ingredient_ids, tag_ids, average):
+        rng = self.rng
+        ingredients, weights = self.popular(ingredient_ids)
+        limit = min(len(ingredients), average * 2)
+
+        def ingredient_rows():
+            for recipe_id in recipe_ids:
+                chosen = set(rng.choices(
+                    ingredients, cum_weights=weights,
+                    k=rng.randint(1, limit)
+                ))
+                for ingredient_id in chosen:
+                    yield RecipeIngredient(
+                        recipe_id=recipe_id, ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+
+        def tag_rows():
+            for recipe_id in recipe_ids:
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, min(3, len(tag_ids)))
+                ):
+                    yield Recipe.tags.through(
+                        recipe_id=recipe_id, tag_id=tag_id
+                    )
+
+        self.insert(
+            RecipeIngredient, ingredient_rows(), len(recipe_ids) * average
+        )
+        self.insert(
+            Recipe.tags.through, tag_rows(), len(recipe_ids) * 2,
+            'теги рецептов'
+        )
+
+    def create_pairs(self, model, field, total, user_ids, popular):
+        """Строки пользователь — объект: объекты по Ципфу, люди поровну."""
+
+        if not popular[0]:
+            return
+        rng = self.rng
+
+        def rows():
+            for target_id in self.draw(popular, total):
+                user_id = rng.choice(user_ids)
+                if field == 'author' and user_id == target_id:
+                    continue
+                yield model(user_id=user_id, **{f'{field}_id': target_id})
+
+        self.insert(model, rows(), total)
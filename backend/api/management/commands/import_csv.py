@@ -1,24 +1,218 @@
+import csv
+import io
 import json
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
 
 from api.models import Ingredient, Tag
-from django.core.management.base import BaseCommand
+from api.versions import bump_version
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+MODELS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('name', 'color', 'slug')),
+}
+DEFAULT_FILES = (
+    ('ingredients', 'data/ingredients.json'),
+    ('tags', 'data/tags.json'),
+)
+
+
+def iter_json_array(file):
+    """Элементы JSON-массива по одному, без чтения файла целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer, started, eof = '', False, False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer.startswith('['):
+            buffer, started = buffer[1:].lstrip(), True
+        if started and buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if started and buffer.startswith(']'):
+            return
+        if buffer and not started:
+            raise CommandError('Файл должен содержать JSON-массив')
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise CommandError('JSON-файл повреждён или оборван')
+        chunk = file.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_csv_rows(file, fields):
+    """Строки CSV как словари; строка заголовка пропускается."""
+
+    for number, row in enumerate(csv.reader(file)):
+        if number == 0 and tuple(row) == fields:
+            continue
+        yield dict(zip(fields, row))
 
 
 class Command(BaseCommand):
-    help = ' Загрузить данные в модель ингредиентов '
+    help = (
+        ' Загрузить справочники ингредиентов и тегов из JSON или CSV. '
+        'Без аргументов загружаются data/ingredients.json и data/tags.json '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Файлы .json или .csv для загрузки',
+        )
+        parser.add_argument(
+            '--model',
+            choices=MODELS,
+            default='ingredients',
+            help='Справочник, в который загружаются указанные файлы',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Число строк в одной пачке записи',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать файлы и откатить запись в конце',
+        )
 
     def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if options['paths']:
+            files = [
+                (options['model'], Path(path)) for path in options['paths']
+            ]
+        else:
+            files = [
+                (model, settings.BASE_DIR / path)
+                for model, path in DEFAULT_FILES
+            ]
         self.stdout.write(self.style.WARNING('Старт команды'))
-        with open('data/ingredients.json', encoding='utf-8',
-                  ) as data_file_ingredients:
-            ingredient_data = json.loads(data_file_ingredients.read())
-            for ingredients in ingredient_data:
-                Ingredient.objects.get_or_create(**ingredients)
-
-        with open('data/tags.json', encoding='utf-8',
-                  ) as data_file_tags:
-            tags_data = json.loads(data_file_tags.read())
-            for tags in tags_data:
-                Tag.objects.get_or_create(**tags)
-
+        with transaction.atomic():
+            for model_name, path in files:
+                self.import_file(model_name, path, options['batch_size'])
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS('Пробный запуск: изменения отменены')
+            )
+            return
+        for model_name in {model_name for model_name, _ in files}:
+            bump_version(model_name)
         self.stdout.write(self.style.SUCCESS('Данные загружены'))
+
+    def read_rows(self, path, fields):
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        file = open(path, encoding='utf-8', newline='')
+        if path.suffix == '.json':
+            return file, iter_json_array(file)
+        if path.suffix == '.csv':
+            return file, iter_csv_rows(file, fields)
+        file.close()
+        raise CommandError(f'Неизвестный формат файла {path}')
+
+    def clean_rows(self, model, fields, items):
+        """Отбросить строки без нужных полей или со слишком длинными."""
+
+        limits = [model._meta.get_field(field).max_length for field in fields]
+        for item in items:
+            values = tuple(
+                item.get(field) if isinstance(item, dict) else None
+                for field in fields
+            )
+            if all(
+                isinstance(value, str) and value and len(value) <= limit
+                for value, limit in zip(values, limits)
+            ):
+                yield values
+            else:
+                self.skipped += 1
+
+    def import_file(self, model_name, path, batch_size):
+        model, fields = MODELS[model_name]
+        self.skipped = 0
+        read = inserted = 0
+        started = perf_counter()
+        file, items = self.read_rows(path, fields)
+        with file:
+            rows = self.clean_rows(model, fields, items)
+            write_batch = (
+                self.copy_batch if connection.vendor == 'postgresql'
+                else self.bulk_create_batch
+            )
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                read += len(batch)
+                inserted += write_batch(model, fields, batch)
+                self.stdout.write(
+                    f'{path.name}: прочитано {read}, '
+                    f'{read / (perf_counter() - started):.0f} строк/с'
+                )
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{path.name} -> {model._meta.verbose_name_plural}: '
+            f'прочитано {read}, добавлено {inserted}, '
+            f'уже было {read - inserted}, пропущено {self.skipped}, '
+            f'{elapsed:.2f} с, {read / elapsed if elapsed else 0:.0f} строк/с'
+        )
+
+    def bulk_create_batch(self, model, fields, batch):
+        """Пачка через INSERT ON CONFLICT; добавленные строки — rowcount."""
+
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} ({", ".join(fields)}) '
+                f'VALUES ({", ".join(["%s"] * len(fields))}) '
+                'ON CONFLICT DO NOTHING',
+                batch,
+            )
+            return cursor.rowcount
+
+    def copy_batch(self, model, fields, batch):
+        """Пачка через COPY во временную таблицу и INSERT ON CONFLICT."""
+
+        table = model._meta.db_table
+        columns = ', '.join(fields)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS import_{table} ('
+                + ', '.join(f'{field} text' for field in fields)
+                + ') ON COMMIT DROP'
+            )
+            cursor.execute(f'TRUNCATE import_{table}')
+            cursor.copy_expert(
+                f'COPY import_{table} ({columns}) FROM STDIN WITH CSV',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM import_{table} '
+                'ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
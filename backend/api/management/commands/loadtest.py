@@ -0,0 +1,369 @@
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from math import ceil
+from statistics import mean, median
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import yaml
+from api.benchmarking import percentile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_SCHEMA = settings.BASE_DIR.parent / 'docs' / 'openapi-schema.yml'
+RECIPE = '/api/recipes/{id}/'
+# Сценарий: вес в смеси и шаги (метод, путь из схемы, параметры запроса).
+# Параметры заполняются в порядке схемы, значение None берётся из enum.
+SCENARIOS = {
+    'browse': (35, (
+        ('get', '/api/recipes/', {
+            'page': lambda rng, data, values: rng.randint(
+                1, max(data['tags'].values())
+            ),
+            'tags': lambda rng, data, values: rng.sample(
+                [
+                    slug for slug, pages in data['tags'].items()
+                    if pages >= values['page']
+                ],
+                1
+            ) + rng.sample(list(data['tags']), rng.randint(0, 1)),
+        }),
+    )),
+    'detail': (25, (('get', RECIPE, {}),)),
+    'favorite': (10, (
+        ('post', RECIPE + 'favorite/', {}),
+        ('delete', RECIPE + 'favorite/', {}),
+    )),
+    'cart': (10, (
+        ('post', RECIPE + 'shopping_cart/', {}),
+        ('delete', RECIPE + 'shopping_cart/', {}),
+    )),
+    'subscriptions': (10, (
+        ('get', '/api/users/subscriptions/', {
+            'recipes_limit': lambda rng, data, values: 3,
+        }),
+    )),
+    'download': (10, (
+        ('get', '/api/recipes/download_shopping_cart/', {'format': None}),
+    )),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples, elapsed):
+    durations = [sample['duration'] for sample in samples]
+    return {
+        'count': len(samples),
+        'errors': sum(not sample['ok'] for sample in samples),
+        'rps': round(len(samples) / elapsed, 2),
+        'mean_ms': round(mean(durations) * 1000, 2),
+        'p50_ms': round(median(durations) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        ' Нагрузочный тест запущенного сервера по сценариям из OpenAPI-схемы '
+        'с отчётом в JSON для сравнения между коммитами '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000',
+            help='Адрес запущенного сервера',
+        )
+        parser.add_argument('--schema', default=str(DEFAULT_SCHEMA))
+        parser.add_argument(
+            '--token',
+            default='',
+            help='Токен пользователя; без него и без --email сценарии, '
+                 'требующие авторизации, пропускаются',
+        )
+        parser.add_argument('--email', default='')
+        parser.add_argument('--password', default='')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=500,
+            help='Число сценариев, выполняемых за прогон',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=20,
+            help='Число сценариев до замера, в отчёт не попадают',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора: одинаковое зерно даёт одинаковые запросы',
+        )
+        parser.add_argument(
+            '--mix',
+            default='',
+            help='Веса сценариев, например browse=50,detail=50',
+        )
+        parser.add_argument(
+            '--output',
+            default='loadtest.json',
+            help='Файл отчёта',
+        )
+        parser.add_argument(
+            '--compare',
+            default='',
+            help='Отчёт прошлого прогона для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options['url'].rstrip('/')
+        with open(options['schema'], encoding='utf-8') as file:
+            self.paths = yaml.safe_load(file)['paths']
+        self.headers = {'Content-Type': 'application/json'}
+        token = options['token'] or self.login(options)
+        if token:
+            self.headers['Authorization'] = f'Token {token}'
+        scenarios = self.select_scenarios(options['mix'], bool(token))
+        self.data = self.discover()
+        rng = random.Random(options['seed'])
+        names = list(scenarios)
+        weights = [scenarios[name] for name in names]
+        plan = rng.choices(
+            names, weights, k=options['warmup'] + options['iterations']
+        )
+        self.concurrency = options['concurrency']
+        self.seed = options['seed']
+        self.run(list(enumerate(plan))[:options['warmup']])
+        started = time.perf_counter()
+        samples = self.run(list(enumerate(plan))[options['warmup']:])
+        elapsed = time.perf_counter() - started
+        report = self.build_report(samples, elapsed, options)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report, options['compare'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Отчёт записан в {options["output"]}')
+        )
+
+    def operation(self, method, path):
+        operation = self.paths.get(path, {}).get(method)
+        if operation is None:
+            raise CommandError(
+                f'В схеме нет операции {method.upper()} {path}'
+            )
+        return operation
+
+    def select_scenarios(self, mix, authorized):
+        weights = {name: weight for name, (weight, _) in SCENARIOS.items()}
+        if mix:
+            try:
+                weights = {
+                    name.strip(): int(weight)
+                    for name, weight in (
+                        item.split('=') for item in mix.split(',')
+                    )
+                }
+            except ValueError:
+                raise CommandError('--mix задаётся как имя=вес,имя=вес')
+        unknown = set(weights) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+            )
+        selected = {}
+        for name, weight in weights.items():
+            steps = SCENARIOS[name][1]
+            operations = [
+                self.operation(method, path) for method, path, _ in steps
+            ]
+            for (method, path, params), operation in zip(steps, operations):
+                names = {
+                    parameter['name']
+                    for parameter in operation.get('parameters', [])
+                }
+                if set(params) - names:
+                    raise CommandError(
+                        f'В схеме {method.upper()} {path} нет параметров '
+                        f'{", ".join(sorted(set(params) - names))}'
+                    )
+            if not authorized and any(
+                'security' in operation for operation in operations
+            ):
+                self.stderr.write(
+                    f'Сценарий {name} пропущен: нужна авторизация'
+                )
+                continue
+            if weight > 0:
+                selected[name] = weight
+        if not selected:
+            raise CommandError('Нет сценариев для запуска')
+        return selected
+
+    def request(self, method, path, params=None, data=None):
+        url = f'{self.base_url}{path}'
+        if params:
+            url = f'{url}?{urlencode(params, doseq=True)}'
+        body = json.dumps(data).encode() if data is not None else None
+        request = Request(
+            url, data=body, headers=self.headers, method=method.upper()
+        )
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=60) as reply:
+                content = reply.read()
+                status = reply.status
+        except HTTPError as error:
+            content, status = error.read(), error.code
+        except (URLError, OSError):
+            content, status = b'', None
+        return status, content, time.perf_counter() - started
+
+    def login(self, options):
+        if not options['email']:
+            return ''
+        status, content, _ = self.request(
+            'post', '/api/auth/token/login/',
+            data={'email': options['email'], 'password': options['password']}
+        )
+        if status not in (200, 201):
+            raise CommandError(f'Не удалось войти: {status} {content[:200]}')
+        return json.loads(content)['auth_token']
+
+    def discover(self):
+        """Данные для подстановки: число страниц по тегам и id рецептов."""
+
+        status, content, _ = self.request('get', '/api/tags/')
+        if status != 200:
+            raise CommandError(f'Сервер {self.base_url} недоступен')
+        tags = {}
+        for tag in json.loads(content):
+            _, content, _ = self.request(
+                'get', '/api/recipes/', {'tags': tag['slug']}
+            )
+            page = json.loads(content)
+            tags[tag['slug']] = max(
+                1, ceil(page['count'] / max(1, len(page['results'])))
+            )
+        _, content, _ = self.request('get', '/api/recipes/', {'limit': 100})
+        recipes = [recipe['id'] for recipe in json.loads(content)['results']]
+        if not tags or not recipes:
+            raise CommandError(
+                'На сервере нет тегов или рецептов: manage.py '
+                'generate_fake_data'
+            )
+        return {'tags': tags, 'recipes': recipes}
+
+    def run_scenario(self, item):
+        index, name = item
+        rng = random.Random(f'{self.seed}-{index}')
+        recipes = self.data['recipes']
+        # Соседние сценарии берут рецепты из разных срезов, чтобы потоки
+        # реже переключали избранное одного и того же рецепта.
+        recipe = rng.choice(
+            recipes[index % self.concurrency::self.concurrency] or recipes
+        )
+        samples = []
+        for method, path, params in SCENARIOS[name][1]:
+            operation = self.operation(method, path)
+            responses = operation.get('responses', {})
+            values = {}
+            for parameter in operation.get('parameters', []):
+                if parameter['name'] not in params:
+                    continue
+                make = params[parameter['name']]
+                values[parameter['name']] = (
+                    make(rng, self.data, values) if make
+                    else rng.choice(parameter['schema']['enum'])
+                )
+            status, _, duration = self.request(
+                method, path.format(id=recipe), values
+            )
+            samples.append({
+                'scenario': name,
+                'operation': f'{method.upper()} {path}',
+                'status': status,
+                'ok': status is not None and status < 500 and (
+                    str(status) in responses or 'default' in responses
+                ),
+                'duration': duration,
+            })
+        return samples
+
+    def run(self, plan):
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            return [
+                sample
+                for samples in executor.map(self.run_scenario, plan)
+                for sample in samples
+            ]
+
+    def build_report(self, samples, elapsed, options):
+        groups = {
+            'scenarios': defaultdict(list),
+            'operations': defaultdict(list),
+        }
+        for sample in samples:
+            groups['scenarios'][sample['scenario']].append(sample)
+            groups['operations'][sample['operation']].append(sample)
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'started': datetime.now(timezone.utc).isoformat(),
+                'url': self.base_url,
+                'concurrency': self.concurrency,
+                'iterations': options['iterations'],
+                'seed': self.seed,
+                'elapsed_s': round(elapsed, 3),
+            },
+            'total': summarize(samples, elapsed),
+        }
+        for group, items in groups.items():
+            report[group] = {
+                name: summarize(group_samples, elapsed)
+                for name, group_samples in sorted(items.items())
+            }
+        for name, operation_samples in groups['operations'].items():
+            statuses = defaultdict(int)
+            for sample in operation_samples:
+                statuses[str(sample['status'])] += 1
+            report['operations'][name]['statuses'] = dict(statuses)
+        return report
+
+    def print_report(self, report, compare):
+        previous = {}
+        if compare:
+            with open(compare, encoding='utf-8') as file:
+                previous = json.load(file)['operations']
+        self.stdout.write(
+            f'{"операция":<48} {"запр/с":>8} {"p50, мс":>9} '
+            f'{"p99, мс":>9} {"ошибки":>7}'
+        )
+        rows = [*report['operations'].items(), ('итого', report['total'])]
+        for name, row in rows:
+            line = (
+                f'{name:<48} {row["rps"]:>8.1f} {row["p50_ms"]:>9.1f} '
+                f'{row["p99_ms"]:>9.1f} {row["errors"]:>7}'
+            )
+            if name in previous and previous[name]['p99_ms']:
+                change = row['p99_ms'] / previous[name]['p99_ms'] - 1
+                line += f' p99 {change:+.0%}'
+            self.stdout.write(line)
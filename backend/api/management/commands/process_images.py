@@ -0,0 +1,38 @@
+from time import sleep
+
+from api.images import process_next
+from django.core.management.base import BaseCommand
+
+INTERVAL = 2.0
+
+
+class Command(BaseCommand):
+    help = (
+        ' Нарезать превью и WebP-версии изображений рецептов из очереди. '
+        'Без --once команда работает как воркер и опрашивает очередь '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            if process_next():
+                total += 1
+                self.stdout.write(f'Обработано задач: {total}')
+            elif options['once']:
+                break
+            else:
+                sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Очередь изображений пуста'))
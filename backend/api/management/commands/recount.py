@@ -0,0 +1,21 @@
+from api.counters import recount
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+class Command(BaseCommand):
+    help = ' Пересчитать счётчики избранного, покупок, рецептов и подписок '
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='База данных, в которой пересчитываются счётчики',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            fixed = recount(options['database'])
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: исправлено строк {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
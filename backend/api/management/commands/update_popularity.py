@@ -0,0 +1,57 @@
+from time import sleep
+
+from api.popularity import mark_all, update_stale
+from api.versions import RECIPES, bump_version
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+INTERVAL = 60.0
+
+
+class Command(BaseCommand):
+    help = (
+        ' Пересчитать популярность рецептов, у которых изменились избранное '
+        'или корзины. Без --once команда работает как воркер '
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Пересчитать очередь и завершиться',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Сначала поставить в очередь все рецепты',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='База данных, в которой пересчитывается популярность',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['full']:
+            mark_all(using)
+        while True:
+            total = 0
+            while True:
+                updated = update_stale(using)
+                if not updated:
+                    break
+                total += updated
+            if total:
+                bump_version(RECIPES)
+                self.stdout.write(f'Пересчитано рецептов: {total}')
+            if options['once']:
+                break
+            sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Популярность пересчитана'))
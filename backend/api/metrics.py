@@ -0,0 +1,352 @@
+"""Замеры запросов: время, SQL, сериализация и размер ответа.
+
+MetricsMiddleware собирает замеры запроса, добавляет заголовок
+Server-Timing для сотрудников и пишет в лог медленные запросы вместе с
+самыми долгими SQL-запросами. Гистограммы копятся в памяти процесса и
+раз в METRICS_FLUSH_INTERVAL секунд прибавляются к счётчикам в общем
+кэше атомарным incr, поэтому /metrics показывает сумму по всем воркерам.
+Ключи счётчиков выводятся из имени представления, а имена представлений
+хранятся в нумерованных ключах: воркеры ничего не читают и не
+перезаписывают целиком, поэтому не теряют замеры друг друга.
+"""
+import asyncio
+import heapq
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from hashlib import md5
+from threading import Lock
+from time import monotonic, perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'foodgram'
+KEY = 'metrics:{}'
+# Число известных представлений, имя представления по номеру и отметка,
+# что представление уже получило номер.
+VIEWS_KEY = 'metrics:views'
+VIEW_KEY = 'metrics:view:{}'
+SEEN_KEY = 'metrics:seen:{}'
+TOP_QUERIES = 5
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+# Имя: (границы корзин, множитель для целой суммы, описание).
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        LATENCY_BUCKETS, 10 ** 6, 'Время обработки запроса.'
+    ),
+    'db_query_duration_seconds': (
+        LATENCY_BUCKETS, 10 ** 6, 'Время SQL-запросов за один запрос.'
+    ),
+    'db_queries': (
+        (1, 2, 5, 10, 20, 50, 100), 1, 'Число SQL-запросов за один запрос.'
+    ),
+    'serializer_duration_seconds': (
+        LATENCY_BUCKETS, 10 ** 6, 'Время сериализации ответа.'
+    ),
+    'response_size_bytes': (
+        (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7), 1,
+        'Размер тела ответа.'
+    ),
+}
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+@dataclass
+class RequestStats:
+    started: float = field(default_factory=perf_counter)
+    queries: int = 0
+    query_time: float = 0
+    serializer_time: float = 0
+    serializer_depth: int = 0
+    size: int = 0
+    slow_queries: list = field(default_factory=list)
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.query_time += duration
+        heapq.heappush(self.slow_queries, (duration, sql))
+        if len(self.slow_queries) > TOP_QUERIES:
+            heapq.heappop(self.slow_queries)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@contextmanager
+def serializer_timer():
+    """Засечь сериализацию; вложенные сериализаторы не считаются дважды."""
+
+    stats = current_stats.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        stats.serializer_time += perf_counter() - started
+
+
+class Registry:
+    """Счётчики процесса, которые периодически уходят в общий кэш."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = {}
+        self._flushed = monotonic()
+
+    def add(self, key, value):
+        self._pending[key] = self._pending.get(key, 0) + value
+
+    def observe(self, view, stats, duration):
+        values = {
+            'request_duration_seconds': duration,
+            'db_query_duration_seconds': stats.query_time,
+            'db_queries': stats.queries,
+            'serializer_duration_seconds': stats.serializer_time,
+            'response_size_bytes': stats.size,
+        }
+        with self._lock:
+            for name, value in values.items():
+                buckets, scale, _ = HISTOGRAMS[name]
+                bucket = next(
+                    (index for index, bound in enumerate(buckets)
+                     if value <= bound),
+                    len(buckets)
+                )
+                self.add((name, view, bucket), 1)
+                self.add((name, view, 'sum'), round(value * scale))
+        if monotonic() - self._flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = monotonic()
+        for view in {view for _, view, _ in pending}:
+            register_view(view)
+        for key, value in pending.items():
+            cache_key = counter_key(key)
+            cache.add(cache_key, 0, timeout=None)
+            try:
+                cache.incr(cache_key, value)
+            except ValueError:
+                cache.set(cache_key, value, timeout=None)
+
+    def collect(self):
+        """Все счётчики из кэша: {(метрика, представление, корзина): n}."""
+
+        self.flush()
+        count = cache.get(VIEWS_KEY) or 0
+        views = cache.get_many(
+            [VIEW_KEY.format(number) for number in range(1, count + 1)]
+        ).values()
+        keys = {
+            counter_key(key): key
+            for view in views
+            for name, (buckets, _, _) in HISTOGRAMS.items()
+            for key in (
+                *((name, view, index) for index in range(len(buckets) + 1)),
+                (name, view, 'sum'),
+            )
+        }
+        values = cache.get_many(keys)
+        return {keys[cache_key]: value for cache_key, value in values.items()}
+
+
+def digest(value):
+    return md5(repr(value).encode()).hexdigest()
+
+
+def counter_key(key):
+    return KEY.format(digest(key))
+
+
+def register_view(view):
+    """Выдать представлению номер, если его ещё не выдал другой воркер."""
+
+    if not cache.add(SEEN_KEY.format(digest(view)), True, timeout=None):
+        return
+    cache.add(VIEWS_KEY, 0, timeout=None)
+    cache.set(VIEW_KEY.format(cache.incr(VIEWS_KEY)), view, timeout=None)
+
+
+registry = Registry()
+
+
+def render_metrics():
+    """Гистограммы в текстовом формате Prometheus."""
+
+    counters = registry.collect()
+    views = sorted({view for _, view, _ in counters})
+    lines = []
+    for name, (buckets, scale, description) in HISTOGRAMS.items():
+        metric = f'{PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for view in views:
+            label = 'view="{}"'.format(view.replace('"', '\\"'))
+            total = 0
+            for index, bound in enumerate((*buckets, '+Inf')):
+                total += counters.get((name, view, index), 0)
+                lines.append(
+                    f'{metric}_bucket{{{label},le="{bound}"}} {total}'
+                )
+            lines.append(
+                f'{metric}_sum{{{label}}} '
+                f'{counters.get((name, view, "sum"), 0) / scale}'
+            )
+            lines.append(f'{metric}_count{{{label}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики для Prometheus.
+
+    Доступны по токену METRICS_TOKEN и сотрудникам; без токена и без
+    DEBUG остальные получают 403.
+    """
+
+    token = settings.METRICS_TOKEN
+    user = getattr(request, 'user', None)
+    allowed = (
+        (token and request.headers.get('Authorization') == f'Bearer {token}')
+        or (user is not None and user.is_staff)
+        or (not token and settings.DEBUG)
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4'
+    )
+
+
+def view_label(request):
+    """Имя представления: RecipeViewSet.download_shopping_cart."""
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is None:
+        return match.view_name or func.__name__
+    action = (getattr(func, 'actions', None) or {}).get(
+        request.method.lower(), request.method.lower()
+    )
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Замеры каждого запроса; подключается первым в MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        for connection in connections.all():
+            install_query_recorder(connection)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return await sync_to_async(self.finish)(request, response, stats)
+
+    def finish(self, request, response, stats):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = self.server_timing(stats)
+        view = view_label(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, view, stats
+            )
+        else:
+            stats.size = len(response.content)
+            self.record(request, view, stats)
+        return response
+
+    def stream(self, content, request, view, stats):
+        """Досчитать потоковый ответ, когда он отдан целиком."""
+
+        current_stats.set(stats)
+        try:
+            for chunk in content:
+                stats.size += len(chunk)
+                yield chunk
+        finally:
+            current_stats.set(None)
+            self.record(request, view, stats)
+
+    def server_timing(self, stats):
+        return (
+            f'db;dur={stats.query_time * 1000:.1f};'
+            f'desc="{stats.queries} queries", '
+            f'serializer;dur={stats.serializer_time * 1000:.1f}, '
+            f'total;dur={(perf_counter() - stats.started) * 1000:.1f}'
+        )
+
+    def record(self, request, view, stats):
+        duration = perf_counter() - stats.started
+        registry.observe(view, stats, duration)
+        if duration < settings.SLOW_REQUEST_SECONDS:
+            return
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс%s',
+            request.method, request.get_full_path(), view, duration * 1000,
+            stats.queries, stats.query_time * 1000,
+            ''.join(
+                f'\n  {query_time * 1000:.1f} мс: {sql[:300]}'
+                for query_time, sql in sorted(stats.slow_queries, reverse=True)
+            )
+        )
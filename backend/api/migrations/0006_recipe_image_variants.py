@@ -0,0 +1,51 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_existing_images(apps, schema_editor):
+    """Поставить в очередь изображения уже созданных рецептов."""
+
+    Recipe = apps.get_model('api', 'Recipe')
+    ImageJob = apps.get_model('api', 'ImageJob')
+    ImageJob.objects.bulk_create(
+        ImageJob(recipe_id=recipe_id, source=image)
+        for recipe_id, image in Recipe.objects.exclude(
+            image__isnull=True
+        ).exclude(image='').values_list('id', 'image').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='варианты изображения'),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='исходный файл')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попытки')),
+                ('error', models.TextField(blank=True, verbose_name='ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создана')),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='image_job', to='api.recipe', verbose_name='рецепт')),
+            ],
+            options={
+                'verbose_name': 'обработка изображения',
+                'verbose_name_plural': 'обработка изображений',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(
+            enqueue_existing_images, migrations.RunPython.noop
+        ),
+    ]
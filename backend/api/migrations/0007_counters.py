@@ -0,0 +1,54 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('FavoriteRecipe', 'Recipe', 'recipe', 'favorites_count'),
+    ('ShoppingCart', 'Recipe', 'recipe', 'in_carts_count'),
+    ('Recipe', 'CustomUser', 'author', 'recipes_count'),
+    ('Follow', 'CustomUser', 'author', 'followers_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    """Заполнить счётчики по существующим строкам."""
+
+    for sender_name, model_name, relation, field in COUNTERS:
+        sender = apps.get_model('api', sender_name)
+        model = apps.get_model(
+            'users' if model_name == 'CustomUser' else 'api', model_name
+        )
+        model.objects.update(**{field: Coalesce(
+            models.Subquery(
+                sender.objects.filter(
+                    **{relation: models.OuterRef('pk')}
+                ).order_by().values(relation).annotate(
+                    total=models.Count('pk')
+                ).values('total'),
+                output_field=models.IntegerField()
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_recipe_image_variants'),
+        ('users', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='в списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия api.cart.UNITS на момент миграции.
+UNITS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'шт': ('шт', 1),
+    'шт.': ('шт', 1),
+}
+
+
+def fill_shopping_lists(apps, schema_editor):
+    """Собрать списки покупок по существующим корзинам."""
+
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('api', 'ShoppingListItem')
+    rows = RecipeIngredient.objects.filter(
+        recipe__shopping_list__isnull=False
+    ).order_by().values_list(
+        'recipe__shopping_list__user_id', 'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(total=models.Sum('amount'))
+    lines = {}
+    for user_id, name, unit, amount in rows.iterator():
+        unit, factor = UNITS.get(unit.strip().lower(), (unit, 1))
+        key = user_id, name, unit
+        lines[key] = lines.get(key, 0) + amount * factor
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, name=name, measurement_unit=unit,
+                amount=amount,
+            )
+            for (user_id, name, unit), amount in lines.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0009_feed_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='название ингридиента')),
+                ('measurement_unit', models.CharField(max_length=200, verbose_name='мера измерения')),
+                ('amount', models.PositiveBigIntegerField(verbose_name='количество')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to=settings.AUTH_USER_MODEL, verbose_name='автор списка')),
+            ],
+            options={
+                'verbose_name': 'строка списка покупок',
+                'verbose_name_plural': 'строки списков покупок',
+                'ordering': ['name', 'measurement_unit'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'name', 'measurement_unit'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
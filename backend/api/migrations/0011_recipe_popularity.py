@@ -0,0 +1,62 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def mark_stale(apps, schema_editor):
+    """Поставить в очередь пересчёта рецепты с избранным и покупками.
+
+    Время добавления уже существующих строк неизвестно, им достаётся
+    время миграции.
+    """
+
+    Recipe = apps.get_model('api', 'Recipe')
+    Recipe.objects.filter(
+        models.Q(favorites_count__gt=0) | models.Q(in_carts_count__gt=0)
+    ).update(popularity_stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favoriterecipe',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity_stale',
+            field=models.BooleanField(default=False, editable=False, verbose_name='популярность устарела'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time', '-id'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('popularity_stale', True)), fields=['id'], name='recipe_popularity_stale_idx'),
+        ),
+        migrations.RunPython(mark_stale, migrations.RunPython.noop),
+    ]
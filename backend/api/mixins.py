@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .caching import HIT, MISS, record, response_cache_key
+from .metrics import serializer_timer
+from .versions import get_version
+
+
+class ConditionalCatalogueMixin:
+    """ETag и условные GET-запросы для справочников.
+
+    ETag строится из версии справочника, поэтому ответ 304 отдаётся
+    без обращения к сериализаторам и базе данных.
+    """
+
+    catalogue_version = None
+
+    def get_catalogue_etag(self, request):
+        return '"{}-{}-{}"'.format(
+            self.catalogue_version,
+            get_version(self.catalogue_version),
+            request.accepted_renderer.format,
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_catalogue_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_cache_control(
+                response, public=True, max_age=settings.CATALOGUE_MAX_AGE
+            )
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class AnonymousResponseCacheMixin:
+    """Кэш ответов list и retrieve для анонимных пользователей.
+
+    Ответ из кэша отдаётся без сериализаторов и запросов к базе данных.
+    Версии в ключе перечисляются в get_response_cache_versions().
+    """
+
+    response_cache_versions = ()
+
+    def get_response_cache_versions(self):
+        return self.response_cache_versions
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(
+            request,
+            f'{self.basename}-{self.action}',
+            self.get_response_cache_versions(),
+        )
+        data = cache.get(key)
+        if data is not None:
+            record(HIT)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        record(MISS)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class SparseFieldsetMixin:
+    """Поля ответа на GET по ?fields= и ?omit= (имена через запятую).
+
+    Лишние поля убираются из сериализатора, а get_queryset по
+    get_requested_fields() не загружает данные для них.
+    """
+
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def get_available_fields(self):
+        return self.get_serializer_class().Meta.fields
+
+    def parse_fields(self, param, available):
+        names = {
+            name.strip()
+            for name in self.request.query_params[param].split(',')
+            if name.strip()
+        }
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({
+                param: 'Неизвестные поля: {}'.format(
+                    ', '.join(sorted(unknown))
+                )
+            })
+        return names
+
+    def get_requested_fields(self):
+        """Имена запрошенных полей или None, если нужны все."""
+
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = None
+            params = self.request.query_params
+            if self.request.method == 'GET' and (
+                self.fields_param in params or self.omit_param in params
+            ):
+                available = self.get_available_fields()
+                fields = set(available)
+                if self.fields_param in params:
+                    fields = self.parse_fields(self.fields_param, available)
+                if self.omit_param in params:
+                    fields -= self.parse_fields(self.omit_param, available)
+                if not fields:
+                    raise ValidationError({
+                        self.fields_param: 'Не выбрано ни одного поля'
+                    })
+                self._requested_fields = fields
+        return self._requested_fields
+
+    def prune_fields(self, serializer):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            serializer_fields = getattr(serializer, 'child', serializer).fields
+            for name in set(serializer_fields) - fields:
+                serializer_fields.pop(name)
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        return self.prune_fields(super().get_serializer(*args, **kwargs))
+
+
+class TimedRepresentationMixin:
+    """Время to_representation попадает в замеры запроса."""
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
 from django.db import models
 
+from .versions import INGREDIENTS, TAGS, bump_version
+
 User = get_user_model()
 
 LIMIT_ING_NAME = 200
@@ -16,6 +19,30 @@ MIN_VALUE = 1
 MAX_VALUE = 32000
 
 
+class VersionedQuerySet(models.QuerySet):
+    """Массовые записи справочника тоже меняют его версию."""
+
+    version = None
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        bump_version(self.version)
+        return objs
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_version(self.version)
+        return rows
+
+
+class IngredientQuerySet(VersionedQuerySet):
+    version = INGREDIENTS
+
+
+class TagQuerySet(VersionedQuerySet):
+    version = TAGS
+
+
 class Ingredient(models.Model):
     """Модель Ингридиента."""
 
@@ -29,10 +56,18 @@ class Ingredient(models.Model):
         verbose_name='мера измерения',
     )
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         verbose_name = 'ингридиент'
         verbose_name_plural = 'игридиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} -> {self.measurement_unit}'
@@ -60,6 +95,8 @@ class Tag(models.Model):
         verbose_name='уникальный слаг',
     )
 
+    objects = TagQuerySet.as_manager()
+
     class Meta:
         ordering = ['id']
         verbose_name = 'тег'
@@ -69,6 +106,81 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы рецептов с флагами текущего пользователя.
+
+    fields — имена полей RecipeReadSerializer из ?fields= и ?omit=:
+    загружается только то, что нужно для них. None — все поля.
+    """
+
+    # Поле ответа: столбец, который не читается, если поле не запрошено.
+    DEFERRABLE = {
+        'text': 'text',
+        'images': 'image_variants',
+    }
+    # Аннотация флага пользователя: поле ответа, которому она нужна.
+    FLAG_FIELDS = {
+        'is_favorited': 'is_favorited',
+        'is_in_shopping_cart': 'is_in_shopping_cart',
+        'author_is_subscribed': 'author',
+    }
+
+    def with_details(self, fields=None):
+        """Автор, теги и ингредиенты рецепта без запросов на каждую строку."""
+
+        deferred = ['search_vector']
+        if fields is not None:
+            deferred += [
+                column for field, column in self.DEFERRABLE.items()
+                if field not in fields
+            ]
+        queryset = self.defer(*deferred)
+        if fields is None or 'author' in fields:
+            queryset = queryset.select_related('author')
+        if fields is None or 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if fields is None or 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                models.Prefetch(
+                    'recipeingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+        return queryset
+
+    def with_user_flags(self, user, fields=None):
+        if not user.is_authenticated:
+            return self
+        flags = {
+            'is_favorited': models.Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk'),
+                )
+            ),
+            'is_in_shopping_cart': models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk'),
+                )
+            ),
+            'author_is_subscribed': models.Exists(
+                Follow.objects.filter(
+                    user=user,
+                    author=models.OuterRef('author'),
+                )
+            ),
+        }
+        if fields is not None:
+            flags = {
+                name: flag for name, flag in flags.items()
+                if self.FLAG_FIELDS[name] in fields
+            }
+        return self.annotate(**flags) if flags else self
+
+
 class Recipe(models.Model):
     """Модель Рецепта."""
 
@@ -76,6 +188,7 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False,
         verbose_name='автор',
     )
 
@@ -117,10 +230,70 @@ class Recipe(models.Model):
 
     )
 
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в избранном',
+    )
+
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в списках покупок',
+    )
+
+    popularity = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='популярность',
+    )
+
+    popularity_stale = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='популярность устарела',
+    )
+
+    image_variants = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='варианты изображения',
+    )
+
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='поисковый вектор',
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = [
+            # Страница автора и превью рецептов в подписках без сортировки;
+            # заменяет одиночный индекс по author.
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_id_idx'
+            ),
+            # Сортировки ?ordering=popular и ?ordering=cooking_time.
+            models.Index(
+                fields=['-popularity', '-id'], name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', '-id'],
+                name='recipe_cooking_time_idx'
+            ),
+            # Очередь пересчёта популярности: в индексе только
+            # помеченные строки.
+            models.Index(
+                fields=['id'],
+                condition=models.Q(popularity_stale=True),
+                name='recipe_popularity_stale_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -183,6 +356,10 @@ class FavoriteRecipe(models.Model):
         related_name='favorite_recipe',
         verbose_name='рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='добавлен',
+    )
 
     class Meta:
         ordering = ['-id']
@@ -214,6 +391,10 @@ class ShoppingCart(models.Model):
         related_name='shopping_list',
         verbose_name='рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='добавлен',
+    )
 
     class Meta:
         ordering = ['-id']
@@ -230,6 +411,43 @@ class ShoppingCart(models.Model):
         return f'{self.user} -> {self.recipe}'
 
 
+class ShoppingListItem(models.Model):
+    """Строка списка покупок: ингредиент по всем рецептам корзины."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        db_index=False,
+        verbose_name='автор списка',
+    )
+    name = models.CharField(
+        max_length=LIMIT_ING_NAME,
+        verbose_name='название ингридиента',
+    )
+    measurement_unit = models.CharField(
+        max_length=LIMIT_ING_UNIT,
+        verbose_name='мера измерения',
+    )
+    amount = models.PositiveBigIntegerField(
+        verbose_name='количество',
+    )
+
+    class Meta:
+        ordering = ['name', 'measurement_unit']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name', 'measurement_unit'],
+                name='unique_shopping_list_item',
+            ),
+        ]
+        verbose_name = 'строка списка покупок'
+        verbose_name_plural = 'строки списков покупок'
+
+    def __str__(self):
+        return f'{self.name} ({self.measurement_unit}) - {self.amount}'
+
+
 class Follow(models.Model):
     """Подписка на автора."""
 
@@ -244,6 +462,7 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name="following",
+        db_index=False,
         verbose_name='автор',
     )
 
@@ -251,6 +470,13 @@ class Follow(models.Model):
         ordering = ['-id']
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        indexes = [
+            # Подписчики автора только по индексу, без чтения таблицы;
+            # заменяет одиночный индекс по author.
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -264,3 +490,71 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.user} -> {self.author}"
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика; запись создаётся при публикации."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False,
+        verbose_name='подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт',
+    )
+
+    class Meta:
+        ordering = ['-recipe']
+        # Индекс ограничения (user, recipe) отдаёт ленту от новых рецептов.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'ленты подписок'
+
+    def __str__(self):
+        return f'{self.user} <- {self.recipe}'
+
+
+class ImageJob(models.Model):
+    """Задача на нарезку вариантов изображения рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_job',
+        verbose_name='рецепт',
+    )
+    source = models.CharField(
+        max_length=255,
+        verbose_name='исходный файл',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='попытки',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='создана',
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'обработка изображения'
+        verbose_name_plural = 'обработка изображений'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.source}'
@@ -1,6 +1,82 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
 
 
 class CustomPagination(PageNumberPagination):
-    page_size = 6
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetPagination(CursorPagination):
+    """Постраничный вывод по курсору: WHERE id < последний id без OFFSET.
+
+    Общее число записей считается, только если передан ?count=true.
+    """
+
+    ordering = '-id'
+    page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in (
+            'true', '1'
+        ):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+
+class FeedPagination(BasePagination):
+    """Нумерация страниц для фронтенда, курсор — по ?cursor=.
+
+    Первая страница в режиме курсора запрашивается с пустым ?cursor=,
+    следующие — по ссылкам next и previous из ответа.
+    """
+
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def __init__(self):
+        self.paginator = CustomPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.paginator = KeysetPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return (
+            CustomPagination().get_schema_fields(view)
+            + KeysetPagination().get_schema_fields(view)[:1]
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            CustomPagination().get_schema_operation_parameters(view)
+            + KeysetPagination().get_schema_operation_parameters(view)[:1]
+        )
@@ -4,6 +4,10 @@ from rest_framework.permissions import SAFE_METHODS, BasePermission
 class AuthorPermission(BasePermission):
     """Только автор может добавить или изменить рецепт."""
 
+    def has_permission(self, request, view):
+        return (request.method in SAFE_METHODS
+                or request.user.is_authenticated)
+
     def has_object_permission(self, request, view, obj):
         return (request.method in SAFE_METHODS
                 or obj.author == request.user)
@@ -0,0 +1,96 @@
+"""Популярность рецептов с затуханием по времени.
+
+Каждое добавление в избранное или корзину весит WEIGHTS и теряет половину
+веса за POPULARITY_HALF_LIFE дней. Веса отсчитываются не от текущего
+момента, а от EPOCH: сумма w * 2 ** ((t - EPOCH) / half_life) отличается
+от затухающей суммы общим для всех рецептов множителем, поэтому порядок
+рецептов со временем не меняется и пересчитывать нужно только рецепты с
+новыми или удалёнными отметками. Хранится двоичный логарифм суммы, чтобы
+числа не росли экспоненциально.
+
+Изменение счётчиков избранного и корзин помечает рецепт popularity_stale
+(см. counters.py), а manage.py update_popularity пересчитывает помеченные
+рецепты пачками.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from .models import FavoriteRecipe, Recipe, ShoppingCart
+
+BATCH_SIZE = 1000
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+WEIGHTS = {
+    FavoriteRecipe: 1,
+    ShoppingCart: 2,
+}
+
+
+def log_sum(exponents):
+    """log2(sum(2 ** e)) без переполнения."""
+
+    top = max(exponents)
+    return top + math.log2(sum(2 ** (e - top) for e in exponents))
+
+
+def scores(recipe_ids, using):
+    """Популярность рецептов по отметкам, сгруппированным по часам."""
+
+    half_life = settings.POPULARITY_HALF_LIFE * 24 * 3600
+    exponents = defaultdict(list)
+    for model, weight in WEIGHTS.items():
+        rows = model.objects.using(using).filter(
+            recipe_id__in=recipe_ids
+        ).order_by().annotate(hour=TruncHour('created')).values_list(
+            'recipe_id', 'hour'
+        ).annotate(total=Count('id'))
+        for recipe_id, hour, total in rows:
+            exponents[recipe_id].append(
+                (hour - EPOCH).total_seconds() / half_life
+                + math.log2(weight * total)
+            )
+    return {
+        recipe_id: log_sum(values) for recipe_id, values in exponents.items()
+    }
+
+
+def update_stale(using, batch_size=BATCH_SIZE):
+    """Пересчитать пачку помеченных рецептов; вернуть их число.
+
+    Отметка снимается до чтения избранного и корзин: рецепт, который
+    изменится во время пересчёта, попадёт в следующую пачку.
+    """
+
+    with transaction.atomic(using=using):
+        recipe_ids = list(
+            Recipe.objects.using(using).select_for_update(
+                skip_locked=True
+            ).filter(popularity_stale=True).order_by('id').values_list(
+                'id', flat=True
+            )[:batch_size]
+        )
+        if not recipe_ids:
+            return 0
+        Recipe.objects.using(using).filter(pk__in=recipe_ids).update(
+            popularity_stale=False
+        )
+    values = scores(recipe_ids, using)
+    Recipe.objects.using(using).bulk_update(
+        [
+            Recipe(pk=recipe_id, popularity=values.get(recipe_id, 0))
+            for recipe_id in recipe_ids
+        ],
+        ['popularity'],
+    )
+    return len(recipe_ids)
+
+
+def mark_all(using):
+    """Поставить в очередь все рецепты, например после смены периода."""
+
+    return Recipe.objects.using(using).update(popularity_stale=True)
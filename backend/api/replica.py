@@ -0,0 +1,121 @@
+"""Чтение с реплики базы данных.
+
+Запросы безопасными методами читают с реплики ``replica``, всё
+остальное идёт в основную базу. После записи пользователь на
+REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы сразу видеть
+свои изменения, даже если реплика отстаёт. Пользователи, токены и сессии
+всегда читаются из основной базы: только что выданный токен может ещё не
+дойти до реплики, а пользователь сессии загружается лениво, пока
+маршрутизатор сам решает, куда читать.
+"""
+import asyncio
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+
+REPLICA = 'replica'
+PRIMARY_APPS = ('auth', 'users', 'authtoken', 'sessions')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'replica-pin:{}'
+
+current_request = ContextVar('current_request', default=None)
+
+
+def pin_to_primary(user):
+    """Читать данные пользователя из основной базы ближайшие секунды."""
+
+    cache.set(
+        PIN_KEY.format(user.pk), True, timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def resolved_user(request):
+    """Пользователь запроса, если он уже загружен; ленивый не трогаем."""
+
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        return getattr(request, '_cached_user', None)
+    return user
+
+
+def is_pinned(request):
+    user = resolved_user(request)
+    if user is None or not user.is_authenticated:
+        return False
+    if getattr(request, '_replica_pin_user', None) != user.pk:
+        request._replica_pin_user = user.pk
+        request._replica_pinned = bool(cache.get(PIN_KEY.format(user.pk)))
+    return request._replica_pinned
+
+
+def use_replica(model):
+    request = current_request.get()
+    return (
+        request is not None
+        and request.method in SAFE_METHODS
+        and model._meta.app_label not in PRIMARY_APPS
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        and not is_pinned(request)
+    )
+
+
+class ReplicaRouter:
+    """Маршрутизатор: чтение в рамках безопасного запроса — с реплики."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if use_replica(model) else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaMiddleware:
+    """Делает запрос видимым маршрутизатору и закрепляет авторов записи.
+
+    Пользователь берётся из запроса после ответа, поэтому учитывается и
+    аутентификация DRF по токену.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        token = current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def pin_writer(self, request):
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in SAFE_METHODS
+            and user is not None and user.is_authenticated
+        ):
+            pin_to_primary(user)
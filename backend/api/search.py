@@ -0,0 +1,177 @@
+"""Поиск ингредиентов и полнотекстовый поиск рецептов."""
+from bisect import bisect_left
+from threading import Lock
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, Recipe
+from .versions import INGREDIENTS, get_version
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'api_recipe_fts'
+RECIPE_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+)
+
+
+class IngredientIndex:
+    """Отсортированный справочник ингредиентов для автодополнения.
+
+    Индекс строится при первом обращении и перестраивается, когда
+    меняется версия справочника. В остальное время поиск не обращается
+    к базе данных.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._catalogue = ([], [], {})
+
+    def _refresh(self):
+        version = get_version(INGREDIENTS)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            ingredients = sorted(
+                Ingredient.objects.all(),
+                key=lambda ingredient: (ingredient.name.casefold(),
+                                        ingredient.id)
+            )
+            self._catalogue = (
+                [ingredient.name.casefold() for ingredient in ingredients],
+                ingredients,
+                {ingredient.id: ingredient for ingredient in ingredients},
+            )
+            self._version = version
+
+    def search(self, query):
+        """Сначала ингредиенты, начинающиеся с query, затем содержащие его."""
+
+        self._refresh()
+        names, ingredients, _ = self._catalogue
+        query = query.strip().casefold()
+        if not query:
+            return list(ingredients)
+        start = end = bisect_left(names, query)
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        contains = [
+            ingredient
+            for name, ingredient in zip(names, ingredients)
+            if query in name and not name.startswith(query)
+        ]
+        return ingredients[start:end] + contains
+
+    def get(self, pk):
+        self._refresh()
+        return self._catalogue[2].get(pk)
+
+
+ingredient_index = IngredientIndex()
+
+
+def update_recipe_search(recipe, using):
+    """Обновить поисковый индекс рецепта после сохранения."""
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        Recipe.objects.using(using).filter(pk=recipe.pk).update(
+            search_vector=RECIPE_SEARCH_VECTOR
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [recipe.pk, recipe.name, recipe.text]
+            )
+
+
+def update_recipes_search(using, min_id=0):
+    """Проиндексировать рецепты с id от min_id, например после bulk_create."""
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        Recipe.objects.using(using).filter(pk__gte=min_id).update(
+            search_vector=RECIPE_SEARCH_VECTOR
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM {Recipe._meta.db_table} '
+                'WHERE id >= %s',
+                [min_id]
+            )
+
+
+def delete_recipe_search(recipe, using):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk]
+            )
+
+
+def fts5_query(value):
+    """Запрос FTS5: каждое слово в кавычках и как префикс."""
+
+    return ' '.join(
+        '"{}"*'.format(term.replace('"', '""')) for term in value.split()
+    )
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, от самых релевантных."""
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    elif vendor == 'sqlite':
+        query = fts5_query(value)
+        if not query:
+            return queryset
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [query]
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'AND {FTS_TABLE}.rowid = {Recipe._meta.db_table}.id',
+                [query],
+                output_field=FloatField()
+            )
+        )
+    else:
+        return queryset.filter(name__icontains=value)
+    return queryset.order_by('-search_rank', '-id')
+
+
+def delete_author_search(author_id, using):
+    """Удалить из индекса все рецепты автора одним запросом."""
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ('
+                f'SELECT id FROM {Recipe._meta.db_table} '
+                'WHERE author_id = %s)',
+                [author_id]
+            )
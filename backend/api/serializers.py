@@ -7,13 +7,25 @@ from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
+from .images import get_variant_urls
+from .mixins import TimedRepresentationMixin
 from .models import (MAX_VALUE, MIN_VALUE, FavoriteRecipe, Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Tag)
-from .utils import create_ingredients
+                     RecipeIngredient, ShoppingCart, ShoppingListItem, Tag)
+from .utils import MAX_BATCH_SIZE, get_recipes_limit, set_ingredients
 
 User = get_user_model()
 
-RECIPES_LIMIT = 10
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на превью и WebP-версии изображения рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return get_variant_urls(recipe, self.context.get('request'))
 
 
 def validate_username_me(value):
@@ -50,7 +62,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         return validate_username_me(value)
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(TimedRepresentationMixin, UserSerializer):
     """Серилизатор для кастомной модели пользователя."""
 
     is_subscribed = SerializerMethodField(read_only=True)
@@ -60,10 +72,12 @@ class CustomUserSerializer(UserSerializer):
         model = User
         fields = (
             'email', 'id', 'username', 'first_name',
-            'last_name', 'is_subscribed'
+            'last_name', 'is_subscribed', 'recipes_count', 'followers_count'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and obj.following.filter(user=request.user).exists())
@@ -72,13 +86,11 @@ class CustomUserSerializer(UserSerializer):
 class SubscribeListSerializer(CustomUserSerializer):
     """Серилизатор подписок пользователя."""
 
-    recipes_count = serializers.SerializerMethodField()
     recipes = SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
-            'recipes_count',
-            'recipes'
+            'recipes',
         )
         read_only_fields = (
             'email',
@@ -109,13 +121,13 @@ class SubscribeListSerializer(CustomUserSerializer):
             )
         return data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit', RECIPES_LIMIT)
-        recipes = obj.recipes.all()[:int(limit)]
+        recipes_preview = self.context.get('recipes_preview')
+        if recipes_preview is not None:
+            recipes = recipes_preview[obj.id]
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.all()[:limit]
         serializer = RecipeShortSerializer(
             recipes,
             many=True,
@@ -124,7 +136,7 @@ class SubscribeListSerializer(CustomUserSerializer):
         return serializer.data
 
 
-class TagsSerializer(serializers.ModelSerializer):
+class TagsSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализация тегов."""
 
     class Meta:
@@ -137,7 +149,9 @@ class TagsSerializer(serializers.ModelSerializer):
         )
 
 
-class IngredientsSerializer(serializers.ModelSerializer):
+class IngredientsSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализация ингредиентов."""
 
     class Meta:
@@ -189,7 +203,9 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор для просмотра рецептов."""
 
     tags = TagsSerializer(
@@ -205,6 +221,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(max_length=None)
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -217,8 +234,11 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'favorites_count',
+            'in_carts_count'
         )
 
     def get_recipe(self, obj):
@@ -228,7 +248,14 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             many=True
         ).data
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and obj.favorite_recipe.filter(
@@ -236,6 +263,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                 ).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and obj.shopping_list.filter(
@@ -243,17 +272,17 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                 ).exists())
 
 
-class CreateRecipeSerializer(serializers.ModelSerializer):
+class CreateRecipeSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор создания рецепта."""
 
     ingredients = IngredientPostSerializer(
         many=True,
         source='recipeingredients'
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-        error_messages={'does_not_exist': 'Указанного тега не существует'}
+    tags = serializers.ListField(
+        child=serializers.IntegerField()
     )
     image = Base64ImageField(max_length=None)
     author = CustomUserSerializer(read_only=True)
@@ -275,21 +304,32 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         )
 
     def validate_tags(self, tags):
-        if not all(Tag.objects.filter(id=tag.id).exists() for tag in tags):
+        found = Tag.objects.in_bulk(set(tags))
+        missing = sorted(set(tags) - found.keys())
+        if missing:
             raise serializers.ValidationError(
-                'Указанного тега не существует')
-        return tags
+                'Указанного тега не существует: '
+                + ', '.join(map(str, missing))
+            )
+        return [found[tag] for tag in dict.fromkeys(tags)]
 
-    def validate_recipeingredients(self, recipeingredients):
+    def validate_ingredients(self, ingredients):
         ingredients_list = [
             ingredient.get('id')
-            for ingredient in recipeingredients
+            for ingredient in ingredients
         ]
         if len(set(ingredients_list)) != len(ingredients_list):
             raise serializers.ValidationError(
                 'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
             )
-        return recipeingredients
+        found = Ingredient.objects.in_bulk(ingredients_list)
+        missing = sorted(set(ingredients_list) - found.keys())
+        if missing:
+            raise serializers.ValidationError(
+                'Указанного ингредиента не существует: '
+                + ', '.join(map(str, missing))
+            )
+        return ingredients
 
     @transaction.atomic
     def create(self, validated_data):
@@ -300,41 +340,51 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             **validated_data
         )
         recipe.tags.set(tags)
-        create_ingredients(ingredients, recipe)
+        set_ingredients(recipe, ingredients, created=True)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('recipeingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.recipeingredients.all().delete()
-        super().update(instance, validated_data)
-        create_ingredients(ingredients, instance)
-        return instance
+        ingredients = validated_data.pop('recipeingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            set_ingredients(instance, ingredients)
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        instance = Recipe.objects.with_details().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(
             instance,
             context={'request': request}
         ).data
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор для полей избранных рецептов и покупок."""
 
+    images = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'images',
             'cooking_time'
         )
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор избранных рецептов."""
 
     class Meta:
@@ -361,7 +411,9 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ).data
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор списка покупок."""
 
     class Meta:
@@ -388,3 +440,30 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
                 'request': self.context.get('request')
             }
         ).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ShoppingListItemSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
+    """Сериализатор строки списка покупок."""
+
+    class Meta:
+        model = ShoppingListItem
+        fields = (
+            'name',
+            'measurement_unit',
+            'amount'
+        )
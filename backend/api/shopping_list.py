@@ -0,0 +1,158 @@
+"""Потоковая выгрузка списка покупок в txt, csv и pdf."""
+import csv
+
+TITLE = 'Список покупок:'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 56
+PDF_FONT_SIZE = 12
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+# Глифы кириллицы для байтов 0xC0-0xFF кодировки cp1251: А-Я и а-я.
+PDF_CYRILLIC_GLYPHS = [
+    f'afii{code}' for code in (
+        *range(10017, 10023), *range(10024, 10050),
+        *range(10065, 10071), *range(10072, 10098),
+    )
+]
+
+
+def format_line(ingredient):
+    return (
+        f"{ingredient['name']} "
+        f"({ingredient['measurement_unit']}) - "
+        f"{ingredient['amount']}"
+    )
+
+
+def render_txt(ingredients):
+    yield f'{TITLE}\n'
+    for ingredient in ingredients:
+        yield f'{format_line(ingredient)}\n'
+
+
+class Echo:
+    """Файловый объект, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['amount'],
+        ))
+
+
+def pdf_text(value):
+    text = value.encode('cp1251', errors='replace')
+    for char in b'\\()':
+        text = text.replace(bytes([char]), b'\\' + bytes([char]))
+    return b'(' + text + b')'
+
+
+def pdf_page_content(lines):
+    content = [
+        b'BT',
+        b'/F1 %d Tf' % PDF_FONT_SIZE,
+        b'%d TL' % PDF_LEADING,
+        b'%d %d Td' % (PDF_MARGIN, PDF_PAGE_HEIGHT - PDF_MARGIN),
+    ]
+    content.extend(pdf_text(line) + b"'" for line in lines)
+    content.append(b'ET')
+    return b'\n'.join(content)
+
+
+def render_pdf(ingredients):
+    """PDF-документ, который пишется постранично по мере чтения строк.
+
+    Объекты страниц выводятся сразу, а дерево страниц и таблица
+    перекрёстных ссылок — в конце, поэтому в памяти держится только
+    текущая страница и смещения объектов.
+    """
+
+    offsets = {}
+    position = 0
+    next_object = 4
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    def write_page(lines):
+        nonlocal next_object
+        content = pdf_page_content(lines)
+        content_number, page_number = next_object, next_object + 1
+        next_object += 2
+        chunk = write_object(
+            content_number,
+            b'<< /Length %d >>\nstream\n' % len(content)
+            + content + b'\nendstream'
+        )
+        chunk += write_object(
+            page_number,
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> '
+            b'/Contents %d 0 R >>'
+            % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, content_number)
+        )
+        return page_number, chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield write_object(
+        3,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        b'/Differences [168 /afii10023 184 /afii10071 192 '
+        + ' '.join(f'/{glyph}' for glyph in PDF_CYRILLIC_GLYPHS).encode()
+        + b'] >> >>'
+    )
+    pages = []
+    lines = [TITLE, '']
+    for ingredient in ingredients:
+        lines.append(format_line(ingredient))
+        if len(lines) == PDF_LINES_PER_PAGE:
+            page_number, chunk = write_page(lines)
+            pages.append(page_number)
+            lines = []
+            yield chunk
+    if lines or not pages:
+        page_number, chunk = write_page(lines)
+        pages.append(page_number)
+        yield chunk
+    yield write_object(
+        2,
+        b'<< /Type /Pages /Kids ['
+        + b' '.join(b'%d 0 R' % page for page in pages)
+        + b'] /Count %d >>' % len(pages)
+    )
+    xref = [b'xref', b'0 %d' % next_object, b'0000000000 65535 f ']
+    xref.extend(
+        b'%010d 00000 n ' % offsets[number]
+        for number in range(1, next_object)
+    )
+    yield (
+        b'\n'.join(xref)
+        + b'\ntrailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+        % (next_object, position)
+    )
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
@@ -0,0 +1,198 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user
+from .cart import (cart_changed, rebuild_for_ingredient, rebuild_for_recipe,
+                   remember_ingredient)
+from .counters import counted_by_cascade, uncount_user_rows, update_counter
+from .deletion import finish_deleting, is_deleting, start_deleting
+from .feed import (backfill, followed_authors, forget_author, push_recipe,
+                   refill_authors)
+from .images import enqueue_image
+from .models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                     RecipeIngredient, ShoppingCart, Tag)
+from .search import (delete_author_search, delete_recipe_search,
+                     update_recipe_search)
+from .versions import (AUTHORS, INGREDIENTS, RECIPES, TAGS, bump_version,
+                       recipe_version)
+
+User = get_user_model()
+
+# Поля пользователя, которых нет в ответах с рецептами.
+PRIVATE_USER_FIELDS = {'password', 'last_login'}
+# Списки покупок зависят только от названия и единицы ингредиента.
+INGREDIENT_LIST_FIELDS = {'name', 'measurement_unit'}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version(INGREDIENTS)
+
+
+@receiver(pre_save, sender=Ingredient)
+def ingredient_saving(sender, instance, using, update_fields, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields and not INGREDIENT_LIST_FIELDS & set(update_fields):
+        instance._saved_as = instance.name, instance.measurement_unit
+        return
+    remember_ingredient(instance, using)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_edited(sender, instance, created, using, **kwargs):
+    if not created:
+        rebuild_for_ingredient(instance, using)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version(TAGS)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, using, **kwargs):
+    update_recipe_search(instance, using)
+    enqueue_image(instance, using, created)
+    if created:
+        push_recipe(instance, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, using, **kwargs):
+    # Рецепты удаляемого автора убирает из индекса deleting_started.
+    if not is_deleting(User, instance.author_id):
+        delete_recipe_search(instance, using)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_version(RECIPES, recipe_version(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_version(RECIPES, recipe_version(instance.recipe_id))
+
+
+# Правки через API пишутся пачками без сигналов, их списки покупок
+# пересчитывает set_ingredients одним вызовом.
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, using, **kwargs):
+    rebuild_for_recipe(instance.recipe_id, using)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, using, **kwargs):
+    rebuild_for_recipe(instance.recipe_id, using, [instance.ingredient_id])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_saved(sender, instance, created, using, **kwargs):
+    if created:
+        cart_changed(instance, 1, using)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_deleted(sender, instance, using, **kwargs):
+    cart_changed(instance, -1, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def deleting_started(sender, instance, using, **kwargs):
+    start_deleting(sender, instance.pk, using)
+    if sender is User:
+        instance._followed_authors = followed_authors(instance.pk, using)
+        uncount_user_rows(instance.pk, using)
+        delete_author_search(instance.pk, using)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def deleting_finished(sender, instance, using, **kwargs):
+    finish_deleting(sender, instance.pk)
+    if sender is User:
+        refill_authors(instance._followed_authors, using)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, using, **kwargs):
+    if created:
+        backfill(instance, using)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, using, **kwargs):
+    # Ленты удаляемого подписчика и рецепты удаляемого автора уходят
+    # каскадом.
+    if not follow_deleting(instance):
+        forget_author(instance, using)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, update_fields, **kwargs):
+    if not instance.recipes_count:
+        return
+    if update_fields and set(update_fields) <= PRIVATE_USER_FIELDS:
+        return
+    bump_version(AUTHORS)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def counted_row_saved(sender, instance, created, using, **kwargs):
+    if created:
+        update_counter(sender, instance, 1, using)
+        counter_changed(sender, instance)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def counted_row_deleted(sender, instance, using, **kwargs):
+    if not counted_by_cascade(sender, instance):
+        update_counter(sender, instance, -1, using)
+    counter_changed(sender, instance)
+
+
+# После counted_row_deleted: решение принимается по уже уменьшенному
+# followers_count. Рецепты удаляемого автора в ленты не пишутся, а
+# авторов удаляемого подписчика проверяет deleting_finished.
+@receiver(post_delete, sender=Follow)
+def follower_lost(sender, instance, using, **kwargs):
+    if not follow_deleting(instance):
+        refill_authors([instance.author_id], using)
+
+
+def follow_deleting(follow):
+    return (
+        is_deleting(User, follow.user_id)
+        or is_deleting(User, follow.author_id)
+    )
+
+
+# Счётчики входят в кэшируемые ответы: рецепта — в списки рецептов,
+# автора — во вложенного автора любого его рецепта.
+def counter_changed(sender, instance):
+    if sender in (FavoriteRecipe, ShoppingCart):
+        bump_version(RECIPES, recipe_version(instance.recipe_id))
+    else:
+        forget_user(instance.author_id)
+        bump_version(AUTHORS)
@@ -0,0 +1,131 @@
+import asyncio
+
+from api import async_views
+from api.async_views import StreamingASGIHandler
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        ShoppingCart)
+from api.urls import async_urlpatterns
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+    path('api/', include('api.urls', namespace='api')),
+]
+
+
+# Представления работают с базой из пула потоков, поэтому данные теста
+# должны быть зафиксированы, а не лежать в незавершённой транзакции.
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTestCase(TransactionTestCase):
+    """Асинхронные представления отвечают так же, как синхронные."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=5,
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=salt, amount=10
+        )
+        FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        # AsyncClient в Django 3.2 передаёт дополнительные аргументы как
+        # заголовки без префикса HTTP_, а данные GET — только в адресе.
+        self.headers = {'authorization': f'Token {self.token.key}'}
+
+    def test_views_are_coroutines(self):
+        for view in (async_views.ingredients, async_views.recipe,
+                     async_views.download_shopping_cart):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    async def test_ingredients(self):
+        response = await self.async_client.get('/api/ingredients/?name=са')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['Сахар']
+        )
+        self.assertTrue(response.has_header('ETag'))
+
+    async def test_recipe_detail_uses_token(self):
+        response = await self.async_client.get(
+            f'/api/recipes/{self.recipe.id}/', **self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['is_favorited'])
+        response = await self.async_client.get('/api/recipes/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_recipe_detail_accepts_writes(self):
+        response = await self.async_client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'name': 'Новое название'},
+            content_type='application/json',
+            **self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    async def test_download_shopping_cart(self):
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        for file_format in ('txt', 'csv', 'pdf'):
+            response = await self.async_client.get(
+                '/api/recipes/download_shopping_cart/'
+                f'?format={file_format}',
+                **self.headers
+            )
+            with self.subTest(format=file_format):
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                # Выгрузка читает базу по мере отдачи, не в цикле событий.
+                content = await sync_to_async(b''.join)(
+                    response.streaming_content
+                )
+                if file_format == 'pdf':
+                    self.assertTrue(content.startswith(b'%PDF'))
+                else:
+                    self.assertIn('Соль', content.decode())
+
+    async def test_handler_streams_outside_event_loop(self):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await StreamingASGIHandler()({
+            'type': 'http',
+            'method': 'GET',
+            'path': '/api/recipes/download_shopping_cart/',
+            'query_string': b'format=txt',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        }, receive, send)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        self.assertTrue(all(
+            message['more_body'] for message in messages[1:-1]
+        ))
+        self.assertIn(
+            'Соль',
+            b''.join(message.get('body', b'') for message in messages[1:])
+            .decode()
+        )
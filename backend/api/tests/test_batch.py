@@ -0,0 +1,178 @@
+from threading import Barrier, Thread
+from unittest import skipUnless
+
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        ShoppingCart)
+from api.versions import get_version, recipe_version
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+FAVORITE_URL = '/api/recipes/favorite/'
+CART_URL = '/api/recipes/shopping_cart/'
+
+
+class BatchEndpointsTestCase(TestCase):
+    """Пакетное добавление и удаление избранного и списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        flour = Ingredient.objects.create(name='Мука', measurement_unit='кг')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Текст',
+                cooking_time=5,
+            )
+            for number in range(10)
+        ]
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=flour, amount=1)
+            for recipe in cls.recipes
+        )
+        cls.ids = [recipe.id for recipe in cls.recipes]
+        cls.missing_id = max(cls.ids) + 1
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'recipes': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (result['id'], result['status'])
+            for result in response.data['results']
+        ]
+
+    def counts(self, field):
+        return list(
+            Recipe.objects.filter(pk__in=self.ids[:3]).order_by(
+                'id'
+            ).values_list(field, flat=True)
+        )
+
+    def test_favorites(self):
+        first, second, third = self.ids[:3]
+        FavoriteRecipe.objects.create(user=self.user, recipe_id=first)
+        version = get_version(recipe_version(second))
+        self.assertEqual(
+            self.send(
+                'post', FAVORITE_URL, [first, second, self.missing_id, second]
+            ),
+            [
+                (first, 'exists'), (second, 'added'),
+                (self.missing_id, 'not_found'),
+            ]
+        )
+        self.assertEqual(self.counts('favorites_count'), [1, 1, 0])
+        self.assertEqual(self.counts('popularity_stale'), [True, True, False])
+        self.assertNotEqual(get_version(recipe_version(second)), version)
+        self.assertEqual(
+            self.send('delete', FAVORITE_URL, [first, third]),
+            [(first, 'removed'), (third, 'missing')]
+        )
+        self.assertEqual(self.counts('favorites_count'), [0, 1, 0])
+        self.assertEqual(
+            list(self.user.favorite_recipe.values_list(
+                'recipe_id', flat=True
+            )),
+            [second]
+        )
+
+    def test_shopping_cart_updates_list(self):
+        self.send('post', CART_URL, self.ids[:3])
+        self.assertEqual(self.counts('in_carts_count'), [1, 1, 1])
+        self.assertEqual(
+            list(self.user.shopping_list_items.values_list(
+                'name', 'measurement_unit', 'amount'
+            )),
+            [('Мука', 'г', 3000)]
+        )
+        self.send('delete', CART_URL, self.ids[1:])
+        self.assertEqual(ShoppingCart.objects.count(), 1)
+        self.assertEqual(
+            self.user.shopping_list_items.get().amount, 1000
+        )
+
+    def test_queries_do_not_depend_on_batch_size(self):
+        counts = []
+        for ids in (self.ids[:2], self.ids[2:]):
+            for method in ('post', 'delete'):
+                with CaptureQueriesContext(connection) as context:
+                    self.send(method, CART_URL, ids)
+                counts.append(len(context))
+        self.assertEqual(counts[:2], counts[2:])
+
+    def test_validation(self):
+        for ids in ([], [0], list(range(1, 102))):
+            response = self.client.post(
+                FAVORITE_URL, {'recipes': ids}, format='json'
+            )
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+        response = APIClient().post(
+            FAVORITE_URL, {'recipes': self.ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужны параллельные транзакции')
+class ConcurrentBatchTestCase(TransactionTestCase):
+    """Одновременные пакетные запросы одного пользователя."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст', cooking_time=5
+        )
+
+    def send_together(self, method, threads=4):
+        barrier = Barrier(threads)
+        statuses = []
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                response = getattr(client, method)(
+                    FAVORITE_URL, {'recipes': [self.recipe.id]},
+                    format='json'
+                )
+                statuses.append(response.data['results'][0]['status'])
+            finally:
+                connections.close_all()
+
+        workers = [Thread(target=send) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sorted(statuses)
+
+    def favorites_count(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.favorites_count
+
+    def test_counter_changes_once(self):
+        self.assertEqual(
+            self.send_together('post'), ['added', 'exists', 'exists', 'exists']
+        )
+        self.assertEqual(self.favorites_count(), 1)
+        self.assertEqual(
+            self.send_together('delete'),
+            ['missing', 'missing', 'missing', 'removed']
+        )
+        self.assertEqual(self.favorites_count(), 0)
@@ -0,0 +1,61 @@
+from api.models import Ingredient, Tag
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class CatalogueETagTestCase(TestCase):
+    """Условные GET-запросы к справочникам тегов и ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_catalogues_return_etag_and_cache_control(self):
+        for url in ('/api/tags/', f'/api/tags/{self.tag.id}/',
+                    '/api/ingredients/',
+                    f'/api/ingredients/{self.ingredient.id}/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertTrue(response['ETag'].startswith('"'))
+                self.assertIn('max-age=', response['Cache-Control'])
+                self.assertIn('public', response['Cache-Control'])
+
+    def test_matching_etag_returns_304_without_queries(self):
+        for url in ('/api/tags/', '/api/ingredients/?name=со'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, status.HTTP_304_NOT_MODIFIED
+                )
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+
+    def test_etag_changes_after_write(self):
+        tags_etag = self.client.get('/api/tags/')['ETag']
+        ingredients_etag = self.client.get('/api/ingredients/')['ETag']
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=tags_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(
+            self.client.get('/api/ingredients/')['ETag'], ingredients_etag
+        )
+
+    def test_missing_object_has_no_etag(self):
+        response = self.client.get('/api/tags/0/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,149 @@
+import io
+
+from api.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                        RecipeIngredient, ShoppingCart)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class CountersTestCase(TestCase):
+    """Счётчики избранного, покупок, рецептов и подписчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email='viewer@foodgram.ru', username='viewer', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=5,
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def counters(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        author = User.objects.get(pk=self.author.pk)
+        return (
+            recipe.favorites_count, recipe.in_carts_count,
+            author.recipes_count, author.followers_count,
+        )
+
+    def test_api_keeps_counters_in_sync(self):
+        recipe = self.recipes[0]
+        self.assertEqual(self.counters(), (0, 0, 3, 0))
+        self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        response = self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['followers_count'], 1)
+        self.assertEqual(response.data['recipes_count'], 3)
+        self.assertEqual(self.counters(), (1, 1, 3, 1))
+        response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.data['favorites_count'], 1)
+        self.assertEqual(response.data['in_carts_count'], 1)
+        self.client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        self.client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.recipes[2].delete()
+        self.assertEqual(self.counters(), (0, 0, 2, 0))
+
+    def test_deleting_user_releases_counters(self):
+        FavoriteRecipe.objects.create(user=self.viewer, recipe=self.recipes[0])
+        ShoppingCart.objects.create(user=self.viewer, recipe=self.recipes[0])
+        Follow.objects.create(user=self.viewer, author=self.author)
+        self.viewer.delete()
+        self.assertEqual(self.counters(), (0, 0, 3, 0))
+
+    def test_deleting_user_does_not_scale_with_rows(self):
+        counts = []
+        for name, recipes in (('one', self.recipes[:1]),
+                              ('all', self.recipes)):
+            user = User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, password='pass'
+            )
+            for recipe in recipes:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+            Follow.objects.create(user=user, author=self.author)
+            with CaptureQueriesContext(connection) as queries:
+                user.delete()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.counters(), (0, 0, 3, 0))
+        self.assertEqual(
+            list(Recipe.objects.values_list('favorites_count', flat=True)),
+            [0, 0, 0]
+        )
+
+    def test_deleting_author_does_not_scale_with_recipes(self):
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        counts = []
+        for name, total in (('one', 1), ('many', 5)):
+            author = User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, password='pass'
+            )
+            for number in range(total):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}',
+                    text='Описание', cooking_time=5,
+                )
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+                FavoriteRecipe.objects.create(user=self.viewer, recipe=recipe)
+                ShoppingCart.objects.create(user=self.viewer, recipe=recipe)
+            ShoppingCart.objects.create(
+                user=self.viewer, recipe=self.recipes[0]
+            )
+            Follow.objects.create(user=self.viewer, author=author)
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    author.delete()
+            counts.append(len(queries))
+            self.assertFalse(self.viewer.shopping_list_items.exists())
+            ShoppingCart.objects.filter(user=self.viewer).delete()
+        self.assertEqual(counts[0], counts[1])
+
+    def test_subscriptions_read_counter_without_count_query(self):
+        Follow.objects.create(user=self.viewer, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.data['results'][0]['recipes_count'], 3)
+        self.assertFalse(
+            any('COUNT(' in query['sql'].upper()
+                and 'api_recipe' in query['sql']
+                for query in queries.captured_queries)
+        )
+
+    def test_recount_repairs_drift(self):
+        FavoriteRecipe.objects.bulk_create([
+            FavoriteRecipe(user=self.viewer, recipe=self.recipes[0]),
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.viewer, author=self.author),
+        ])
+        User.objects.filter(pk=self.author.pk).update(recipes_count=7)
+        stdout = io.StringIO()
+        call_command('recount', stdout=stdout)
+        self.assertEqual(self.counters(), (1, 0, 3, 1))
+        self.assertIn(
+            'recipe.favorites_count: исправлено строк 1', stdout.getvalue()
+        )
@@ -0,0 +1,173 @@
+from unittest import mock
+
+from api import feed
+from api.feed import rebuild_feed
+from api.models import FeedEntry, Follow, Recipe
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(FEED_LENGTH=5, FEED_FANOUT_LIMIT=2)
+class FeedTestCase(TestCase):
+    """Лента подписок: раскладка при публикации и подмешивание при чтении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, cls.other, cls.author, cls.star, cls.stranger = (
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, password='pass'
+            )
+            for name in ('viewer', 'other', 'author', 'star', 'stranger')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def publish(self, author, count=1):
+        return [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=5,
+            ).id
+            for number in range(count)
+        ]
+
+    def feed(self, query=''):
+        response = self.client.get(f'/api/recipes/feed/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_new_recipes_are_pushed_to_followers(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        recipe_ids = self.publish(self.author, 3)
+        self.publish(self.stranger)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.viewer).count(), 3
+        )
+        self.assertEqual(self.feed(), recipe_ids[::-1])
+
+    def test_subscribe_backfills_and_unsubscribe_clears(self):
+        recipe_ids = self.publish(self.author, 7)
+        self.assertEqual(self.feed(), [])
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.feed('?limit=10'), recipe_ids[:-6:-1])
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedEntry.objects.exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=3)
+    def test_feed_is_trimmed_on_write(self):
+        for user in (self.viewer, self.other):
+            Follow.objects.create(user=user, author=self.author)
+        recipe_ids = self.publish(self.author, 8)
+        for user in (self.viewer, self.other):
+            self.assertEqual(
+                list(FeedEntry.objects.filter(user=user).order_by(
+                    '-recipe_id'
+                ).values_list('recipe_id', flat=True)),
+                recipe_ids[:-6:-1]
+            )
+
+    def test_reading_feed_does_not_write(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.publish(self.author, 3)
+        with CaptureQueriesContext(connection) as context:
+            self.feed()
+        self.assertFalse(any(
+            query['sql'].startswith(('DELETE', 'INSERT', 'UPDATE'))
+            for query in context.captured_queries
+        ))
+
+    def test_popular_author_is_merged_on_read(self):
+        for user in (self.viewer, self.other):
+            Follow.objects.create(user=user, author=self.star)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        star_ids = self.publish(self.star, 2)
+        author_ids = self.publish(self.author, 2)
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe_id__in=star_ids).exists()
+        )
+        expected = sorted(star_ids + author_ids, reverse=True)
+        self.assertEqual(self.feed(), expected)
+        self.assertEqual(self.feed('?cursor=&limit=3'), expected[:3])
+
+    def test_author_below_limit_is_pushed_to_feeds(self):
+        for user in (self.viewer, self.other):
+            Follow.objects.create(user=user, author=self.star)
+        star_ids = self.publish(self.star, 2)
+        self.assertFalse(FeedEntry.objects.exists())
+        with self.captureOnCommitCallbacks() as callbacks:
+            Follow.objects.get(user=self.other, author=self.star).delete()
+        self.assertFalse(FeedEntry.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user_id', flat=True)),
+            [self.viewer.id] * 2
+        )
+        self.assertEqual(self.feed(), star_ids[::-1])
+        Follow.objects.create(user=self.other, author=self.star)
+        self.star.delete()
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_deleted_follower_refills_feeds(self):
+        for user in (self.viewer, self.other):
+            Follow.objects.create(user=user, author=self.star)
+        star_ids = self.publish(self.star, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(self.feed(), star_ids[::-1])
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.viewer).count(), 2
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=4)
+    def test_refill_is_written_in_batches(self):
+        followers = (self.viewer, self.other, self.author, self.stranger)
+        for user in followers:
+            Follow.objects.create(user=user, author=self.star)
+        self.publish(self.star, 2)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Follow.objects.get(user=self.viewer, author=self.star).delete()
+        with mock.patch.object(feed, 'BATCH_SIZE', 2):
+            with CaptureQueriesContext(connection) as context:
+                for callback in callbacks:
+                    callback()
+        inserts = [
+            query for query in context.captured_queries
+            if f'INTO "{FeedEntry._meta.db_table}"' in query['sql']
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(FeedEntry.objects.count(), 6)
+
+    def test_feed_is_one_range_query(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.publish(self.author, 3)
+        with CaptureQueriesContext(connection) as context:
+            self.feed('?cursor=')
+        feed_queries = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and FeedEntry._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(feed_queries), 1)
+        self.assertNotIn('DISTINCT', feed_queries[0])
+
+    def test_rebuild_feed(self):
+        recipe_ids = self.publish(self.author, 3)
+        Follow.objects.bulk_create([
+            Follow(user=self.viewer, author=self.author)
+        ])
+        rebuild_feed(self.viewer.id, DEFAULT_DB_ALIAS)
+        self.assertEqual(self.feed(), recipe_ids[::-1])
+
+    def test_requires_authentication(self):
+        response = APIClient().get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
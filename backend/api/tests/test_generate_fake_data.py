@@ -0,0 +1,97 @@
+import io
+import shutil
+import tempfile
+
+from api.counters import recount
+from api.models import (FavoriteRecipe, FeedEntry, Follow, Ingredient, Recipe,
+                        RecipeIngredient, Tag)
+from api.search import search_recipes
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class GenerateFakeDataTestCase(TestCase):
+    """Синтетические данные: связи, счётчики и перекос популярности."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for number in range(20):
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+        for slug, color in (
+            ('breakfast', '#E26C2D'), ('lunch', '#49B64E'),
+            ('dinner', '#8775D2'),
+        ):
+            Tag.objects.create(name=slug, color=color, slug=slug)
+
+    def call(self, **options):
+        options = {
+            'users': 30, 'recipes': 60, 'favorites': 600, 'carts': 100,
+            'follows': 200, 'batch_size': 50, 'seed': 1, **options,
+        }
+        call_command('generate_fake_data', stdout=io.StringIO(), **options)
+
+    def favorites(self):
+        first_user = User.objects.order_by('pk').first().pk
+        first_recipe = Recipe.objects.order_by('pk').first().pk
+        return sorted(
+            (user - first_user, recipe - first_recipe)
+            for user, recipe in FavoriteRecipe.objects.values_list(
+                'user_id', 'recipe_id'
+            )
+        )
+
+    def test_rows_and_counters(self):
+        self.call()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertFalse(
+            Recipe.objects.filter(recipeingredients__isnull=True).exists()
+        )
+        self.assertFalse(Recipe.objects.filter(tags__isnull=True).exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertTrue(RecipeIngredient.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertFalse(
+            FeedEntry.objects.exclude(
+                recipe__author__following__user=F('user')
+            ).exists()
+        )
+        self.assertFalse(any(recount().values()))
+        name = Recipe.objects.first().name.split()[0]
+        self.assertTrue(search_recipes(Recipe.objects.all(), name).exists())
+
+    def test_popularity_is_skewed(self):
+        self.call()
+        counts = list(
+            Recipe.objects.order_by('-favorites_count').values_list(
+                'favorites_count', flat=True
+            )
+        )
+        self.assertGreater(counts[0], 3 * counts[len(counts) // 2])
+
+    def test_seed_is_reproducible(self):
+        self.call()
+        first = self.favorites()
+        FavoriteRecipe.objects.all().delete()
+        Recipe.objects.all().delete()
+        User.objects.all().delete()
+        self.call()
+        self.assertEqual(self.favorites(), first)
+
+    def test_requires_catalogue(self):
+        Ingredient.objects.all().delete()
+        with self.assertRaises(CommandError):
+            self.call()
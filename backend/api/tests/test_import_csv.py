@@ -0,0 +1,89 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from api.management.commands import import_csv
+from api.models import Ingredient, Tag
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class ImportCsvTestCase(TestCase):
+    """Потоковая загрузка справочников."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = self.path / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def call(self, *args, **kwargs):
+        call_command('import_csv', *args, stdout=io.StringIO(), **kwargs)
+
+    def test_json_and_csv_are_idempotent(self):
+        json_path = self.write('ingredients.json', json.dumps([
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'вода', 'measurement_unit': 'мл'},
+            {'name': 'соль', 'measurement_unit': 'г'},
+        ], ensure_ascii=False))
+        csv_path = self.write(
+            'ingredients.csv', 'name,measurement_unit\nсоль,г\nсахар,г\n'
+        )
+        self.call(json_path, csv_path, batch_size=1)
+        self.call(json_path, csv_path, batch_size=2)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name', flat=True)),
+            ['вода', 'сахар', 'соль'],
+        )
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write('ingredients.json', json.dumps([
+            {'name': 'соль'},
+            {'name': 'x' * 201, 'measurement_unit': 'г'},
+            'строка',
+            {'name': 'перец', 'measurement_unit': 'г'},
+        ]))
+        self.call(path)
+        self.assertEqual(
+            list(Ingredient.objects.values_list('name', flat=True)),
+            ['перец'],
+        )
+
+    def test_dry_run_does_not_write(self):
+        path = self.write('tags.csv', 'Обед,#49B64E,lunch\n')
+        self.call(path, model='tags', dry_run=True)
+        self.assertFalse(Tag.objects.exists())
+        self.call(path, model='tags')
+        self.assertTrue(Tag.objects.filter(slug='lunch').exists())
+
+    def test_json_reader_handles_chunk_boundaries(self):
+        items = [{'name': f'ингредиент {number}'} for number in range(50)]
+        with mock.patch.object(import_csv, 'READ_CHUNK_SIZE', 7):
+            parsed = list(import_csv.iter_json_array(
+                io.StringIO(json.dumps(items, ensure_ascii=False))
+            ))
+        self.assertEqual(parsed, items)
+
+    def test_summary_counts_inserted_rows_without_table_scans(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        path = self.write(
+            'ingredients.csv', 'соль,г\nвода,мл\nвода,мл\nсахар,г\n'
+        )
+        stdout = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_csv', path, batch_size=2, stdout=stdout)
+        self.assertIn('добавлено 2, уже было 2', stdout.getvalue())
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql'].upper()
+        ])
@@ -0,0 +1,50 @@
+from api.models import Ingredient
+from api.search import ingredient_index
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+class IngredientIndexTestCase(TestCase):
+    """Поиск ингредиентов по индексу в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Соль', 'Солод', 'Морская соль', 'Сахар', 'Фасоль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/ingredients/', {'name': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_matches_come_before_substring_matches(self):
+        self.assertEqual(
+            self.search('сол'),
+            ['Солод', 'Соль', 'Морская соль', 'Фасоль'],
+        )
+
+    def test_empty_query_returns_catalogue(self):
+        self.assertEqual(len(self.search('')), 5)
+
+    def test_steady_state_does_not_touch_database(self):
+        self.search('с')
+        with self.assertNumQueries(0):
+            self.search('са')
+            response = self.client.get('/api/ingredients/0/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_is_rebuilt_after_write(self):
+        self.assertEqual(self.search('сахар'), ['Сахар'])
+        Ingredient.objects.create(name='Сахарная пудра', measurement_unit='г')
+        self.assertEqual(self.search('сахар'), ['Сахар', 'Сахарная пудра'])
+        Ingredient.objects.filter(name='Сахар').get().delete()
+        self.assertEqual(self.search('сахар'), ['Сахарная пудра'])
+
+    def test_retrieve_uses_index(self):
+        ingredient = ingredient_index.search('соль')[0]
+        response = self.client.get(f'/api/ingredients/{ingredient.id}/')
+        self.assertEqual(response.data['name'], 'Соль')
@@ -0,0 +1,73 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from api.models import Ingredient, Recipe, RecipeIngredient, Tag
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase
+
+User = get_user_model()
+
+
+class LoadTestCommandTestCase(LiveServerTestCase):
+    """Нагрузочный тест по схеме против живого сервера."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = Path(self.directory.name) / 'report.json'
+        user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=5,
+            )
+            recipe.tags.set([tag])
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10
+            )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def call(self, **options):
+        # Тестовая база SQLite в памяти не выдерживает параллельную запись.
+        call_command(
+            'loadtest', url=self.live_server_url, email='user@foodgram.ru',
+            password='pass', concurrency=1, iterations=30, warmup=0,
+            output=str(self.output), stdout=io.StringIO(),
+            stderr=io.StringIO(), **options
+        )
+        return json.loads(self.output.read_text(encoding='utf-8'))
+
+    def test_report(self):
+        report = self.call()
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(report['meta']['iterations'], 30)
+        self.assertEqual(
+            sum(row['count'] for row in report['scenarios'].values()),
+            report['total']['count'],
+        )
+        for name, row in report['operations'].items():
+            with self.subTest(operation=name):
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertEqual(sum(row['statuses'].values()), row['count'])
+
+    def test_same_seed_gives_same_plan(self):
+        first = self.call(seed=7, mix='browse=1,detail=1')
+        second = self.call(seed=7, mix='browse=1,detail=1')
+        self.assertEqual(
+            {name: row['count'] for name, row in first['scenarios'].items()},
+            {name: row['count'] for name, row in second['scenarios'].items()},
+        )
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(CommandError):
+            self.call(mix='checkout=1')
@@ -0,0 +1,145 @@
+import re
+
+from api.metrics import Registry, RequestStats
+from api.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0, RESPONSE_CACHE_TIMEOUT=0)
+class MetricsTestCase(TestCase):
+    """Замеры запросов, Server-Timing и эндпоинт /metrics."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.staff = User.objects.create_user(
+            email='staff@foodgram.ru', username='staff', password='pass',
+            is_staff=True,
+        )
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание', cooking_time=5
+        )
+        recipe.tags.set([tag])
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=10
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def metrics(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content.decode()
+
+    def sample(self, text, metric, view, suffix='count'):
+        match = re.search(
+            rf'^foodgram_{metric}_{suffix}{{view="{re.escape(view)}"}} (\S+)$',
+            text, re.MULTILINE
+        )
+        return float(match.group(1)) if match else None
+
+    def test_histograms_by_viewset_action(self):
+        for _ in range(2):
+            self.client_for().get('/api/recipes/')
+        text = self.metrics()
+        self.assertIn(
+            '# TYPE foodgram_request_duration_seconds histogram', text
+        )
+        view = 'RecipeViewSet.list'
+        self.assertEqual(
+            self.sample(text, 'request_duration_seconds', view), 2
+        )
+        self.assertIn(
+            f'foodgram_request_duration_seconds_bucket{{view="{view}",'
+            'le="+Inf"} 2', text
+        )
+        self.assertGreater(self.sample(text, 'db_queries', view, 'sum'), 0)
+        self.assertGreater(
+            self.sample(text, 'serializer_duration_seconds', view, 'sum'), 0
+        )
+        self.assertGreater(
+            self.sample(text, 'response_size_bytes', view, 'sum'), 0
+        )
+
+    def test_streaming_download_is_measured(self):
+        response = self.client_for(self.user).get(
+            '/api/recipes/download_shopping_cart/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        size = len(b''.join(response.streaming_content))
+        text = self.metrics()
+        view = 'RecipeViewSet.download_shopping_cart'
+        self.assertEqual(
+            self.sample(text, 'response_size_bytes', view, 'sum'), size
+        )
+        self.assertGreater(self.sample(text, 'db_queries', view, 'sum'), 0)
+
+    def test_server_timing_only_for_staff(self):
+        response = self.client_for(self.user).get('/api/recipes/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        response = self.client_for(self.staff).get('/api/recipes/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, '
+            r'total;dur=[\d.]+$'
+        )
+
+    @override_settings(SLOW_REQUEST_SECONDS=0)
+    def test_slow_request_is_logged_with_queries(self):
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            self.client_for().get('/api/recipes/')
+        self.assertIn('RecipeViewSet.list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        response = self.client_for().get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client_for().get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_require_staff_without_token(self):
+        response = self.client_for().get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        client = APIClient()
+        client.force_login(self.user)
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(DEBUG=True):
+            response = self.client_for().get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_workers_are_summed(self):
+        workers = Registry(), Registry()
+        for worker, view in zip(workers, ('First.list', 'Second.list')):
+            worker.observe(view, RequestStats(), 0.01)
+            worker.observe('Shared.list', RequestStats(), 0.01)
+        text = self.metrics()
+        for view, count in (
+            ('First.list', 1), ('Second.list', 1), ('Shared.list', 2)
+        ):
+            with self.subTest(view=view):
+                self.assertEqual(
+                    self.sample(text, 'request_duration_seconds', view),
+                    count
+                )
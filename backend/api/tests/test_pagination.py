@@ -0,0 +1,129 @@
+from urllib.parse import urlsplit
+
+from api.models import Follow, Recipe, Tag
+from api.pagination import MAX_PAGE_SIZE
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class FeedPaginationTestCase(TestCase):
+    """Постраничный вывод по номеру страницы и по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email='viewer@foodgram.ru', username='viewer', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@foodgram.ru',
+                username=f'author{number}', password='pass',
+            )
+            for number in range(7)
+        ]
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'Рецепт {number}', text='Описание',
+                cooking_time=number + 1,
+            )
+            for number in range(MAX_PAGE_SIZE + 20)
+        )
+        cls.recipe_ids = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        cls.tag.recipes.set(cls.recipe_ids[::2])
+        cls.other_tag = Tag.objects.create(
+            name='Ужин', color='#8775D2', slug='dinner'
+        )
+        cls.other_tag.recipes.set(cls.recipe_ids[::3])
+        Follow.objects.bulk_create(
+            Follow(user=cls.viewer, author=author) for author in cls.authors
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def walk(self, url):
+        """Пройти все страницы по ссылкам next и собрать id."""
+
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+            if url:
+                parts = urlsplit(url)
+                url = f'{parts.path}?{parts.query}'
+            pages += 1
+        return ids, pages
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/recipes/?page=2&limit=10')
+        self.assertEqual(response.data['count'], len(self.recipe_ids))
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            self.recipe_ids[10:20],
+        )
+
+    def test_cursor_walks_every_recipe_once(self):
+        ids, pages = self.walk('/api/recipes/?cursor=&limit=25')
+        self.assertEqual(ids, self.recipe_ids)
+        self.assertEqual(pages, 5)
+
+    def test_cursor_respects_filters(self):
+        ids, _ = self.walk('/api/recipes/?cursor=&limit=7&tags=lunch')
+        self.assertEqual(ids, self.recipe_ids[::2])
+
+    def test_several_tags_without_duplicates(self):
+        expected = [
+            recipe_id for index, recipe_id in enumerate(self.recipe_ids)
+            if index % 2 == 0 or index % 3 == 0
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                '/api/recipes/?tags=lunch&tags=dinner&limit=100'
+            )
+        self.assertEqual(response.data['count'], len(expected))
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], expected
+        )
+        self.assertFalse(any(
+            'DISTINCT' in query['sql'] for query in context.captured_queries
+        ))
+        ids, _ = self.walk(
+            '/api/recipes/?cursor=&limit=9&tags=lunch&tags=dinner'
+        )
+        self.assertEqual(ids, expected)
+
+    def test_cursor_count_is_optional(self):
+        response = self.client.get('/api/recipes/?cursor=&count=true')
+        self.assertEqual(response.data['count'], len(self.recipe_ids))
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_size_is_capped(self):
+        for mode in ('', 'cursor=&'):
+            with self.subTest(mode=mode or 'page'):
+                response = self.client.get(f'/api/recipes/?{mode}limit=100000')
+                self.assertEqual(len(response.data['results']), MAX_PAGE_SIZE)
+        response = self.client.get('/api/users/?limit=100000')
+        self.assertLessEqual(len(response.data['results']), MAX_PAGE_SIZE)
+
+    def test_subscriptions_cursor(self):
+        ids, pages = self.walk('/api/users/subscriptions/?cursor=&limit=3')
+        self.assertEqual(
+            ids, sorted((author.id for author in self.authors), reverse=True)
+        )
+        self.assertEqual(pages, 3)
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from api.models import FavoriteRecipe, Recipe, ShoppingCart
+from api.popularity import update_stale
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(POPULARITY_HALF_LIFE=7, RESPONSE_CACHE_TIMEOUT=0)
+class PopularityTestCase(TestCase):
+    """Популярность с затуханием и сортировки списка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@foodgram.ru', username=f'user{number}',
+                password='pass',
+            )
+            for number in range(3)
+        ]
+        cls.fresh, cls.old, cls.quick = (
+            Recipe.objects.create(
+                author=cls.users[0], name=name, text='Текст',
+                cooking_time=cooking_time,
+            )
+            for name, cooking_time in (
+                ('Свежий', 30), ('Старый', 20), ('Быстрый', 5)
+            )
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def update(self):
+        while update_stale(DEFAULT_DB_ALIAS):
+            pass
+
+    def ids(self, query):
+        response = self.client.get(f'/api/recipes/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_favorite_marks_recipe_stale(self):
+        response = self.client.post(f'/api/recipes/{self.old.id}/favorite/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.popularity_stale)
+        self.update()
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.popularity_stale)
+        self.assertGreater(self.old.popularity, 0)
+        self.client.delete(f'/api/recipes/{self.old.id}/favorite/')
+        self.update()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.popularity, 0)
+
+    def test_old_marks_decay(self):
+        for user in self.users:
+            FavoriteRecipe.objects.create(user=user, recipe=self.old)
+        ShoppingCart.objects.create(user=self.users[0], recipe=self.fresh)
+        FavoriteRecipe.objects.filter(recipe=self.old).update(
+            created=timezone.now() - timedelta(days=21)
+        )
+        self.update()
+        # 3 отметки три периода назад весят 3/8, корзина сейчас — 2.
+        self.assertEqual(
+            self.ids('?ordering=popular'),
+            [self.fresh.id, self.old.id, self.quick.id]
+        )
+        self.old.refresh_from_db()
+        self.fresh.refresh_from_db()
+        self.assertAlmostEqual(
+            self.fresh.popularity - self.old.popularity, 1 + 3 - 1.585, 2
+        )
+
+    def test_orderings(self):
+        self.assertEqual(
+            self.ids('?ordering=cooking_time'),
+            [self.quick.id, self.old.id, self.fresh.id]
+        )
+        self.assertEqual(
+            self.ids('?ordering=new'), self.ids(''),
+        )
+        response = self.client.get('/api/recipes/?ordering=rating')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+
+    def test_cursor_follows_ordering(self):
+        FavoriteRecipe.objects.create(user=self.users[0], recipe=self.old)
+        call_command('update_popularity', '--once', stdout=StringIO())
+        response = self.client.get(
+            '/api/recipes/?ordering=popular&cursor=&limit=2'
+        )
+        first = [recipe['id'] for recipe in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(
+            first + second, [self.old.id, self.quick.id, self.fresh.id]
+        )
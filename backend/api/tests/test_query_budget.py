@@ -0,0 +1,442 @@
+"""Бюджет SQL-запросов и время ответа эндпоинтов API.
+
+Каждый эндпоинт из api/urls.py и djoser вызывается анонимно и от имени
+авторизованного пользователя. Число запросов к БД не должно превышать
+потолок и не должно зависеть от размера страницы. С переменной окружения
+UPDATE_PERF_BASELINE время ответа записывается в perf_baseline.json, чтобы
+замедления были видны в диффе; обычный прогон файл не меняет.
+"""
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from api.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                        RecipeIngredient, ShoppingCart, Tag)
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'perf_baseline.json'
+MEDIA_ROOT = tempfile.mkdtemp()
+REPEATS = 3
+SMALL_PAGE = 1
+LARGE_PAGE = 50
+PASSWORD = 'Tr1cky-passw0rd'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+Endpoint = namedtuple(
+    'Endpoint',
+    'name method url data anon_status auth_status anon_max auth_max',
+)
+
+
+def recipe_payload(ids):
+    return {
+        'ingredients': [
+            {'id': ids['ingredient'], 'amount': 10},
+            {'id': ids['other_ingredient'], 'amount': 20},
+        ],
+        'tags': [ids['tag']],
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 15,
+    }
+
+
+# POST /api/users/set_username/ не проверяется: djoser 2.1.0 ожидает
+# поле new_<USERNAME_FIELD>, а при LOGIN_FIELD = 'email' сериализатор
+# возвращает new_email, и представление падает с KeyError.
+ENDPOINTS = (
+    Endpoint('api_root', 'get', '/api/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 0, 1),
+    Endpoint('users_list', 'get', '/api/users/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 2, 3),
+    Endpoint('users_create', 'post', '/api/users/',
+             lambda ids: {
+                 'email': 'new@foodgram.ru', 'username': 'new_user',
+                 'first_name': 'Новый', 'last_name': 'Пользователь',
+                 'password': PASSWORD,
+             },
+             status.HTTP_201_CREATED, status.HTTP_201_CREATED, 5, 6),
+    Endpoint('users_retrieve', 'get', '/api/users/{author}/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 2),
+    Endpoint('users_partial_update', 'patch', '/api/users/{viewer}/',
+             lambda ids: {'first_name': 'Иван'},
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 3),
+    Endpoint('users_destroy', 'delete', '/api/users/{viewer}/',
+             lambda ids: {'current_password': PASSWORD},
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 34),
+    Endpoint('users_me', 'get', '/api/users/me/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 2),
+    Endpoint('users_set_password', 'post', '/api/users/set_password/',
+             lambda ids: {
+                 'current_password': PASSWORD,
+                 'new_password': 'An0ther-passw0rd',
+             },
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 2),
+    Endpoint('users_reset_password', 'post', '/api/users/reset_password/',
+             lambda ids: {'email': 'nobody@foodgram.ru'},
+             status.HTTP_204_NO_CONTENT, status.HTTP_204_NO_CONTENT, 1, 2),
+    Endpoint('users_reset_password_confirm', 'post',
+             '/api/users/reset_password_confirm/',
+             lambda ids: {
+                 'uid': 'invalid', 'token': 'invalid',
+                 'new_password': 'An0ther-passw0rd',
+             },
+             status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, 0, 1),
+    Endpoint('users_reset_username', 'post', '/api/users/reset_username/',
+             lambda ids: {'email': 'nobody@foodgram.ru'},
+             status.HTTP_204_NO_CONTENT, status.HTTP_204_NO_CONTENT, 1, 2),
+    Endpoint('users_reset_username_confirm', 'post',
+             '/api/users/reset_username_confirm/',
+             lambda ids: {
+                 'uid': 'invalid', 'token': 'invalid',
+                 'new_email': 'renamed@foodgram.ru',
+             },
+             status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, 1, 2),
+    Endpoint('users_activation', 'post', '/api/users/activation/',
+             lambda ids: {'uid': 'invalid', 'token': 'invalid'},
+             status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, 0, 1),
+    Endpoint('users_resend_activation', 'post',
+             '/api/users/resend_activation/',
+             lambda ids: {'email': 'viewer@foodgram.ru'},
+             status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, 1, 2),
+    Endpoint('users_subscriptions', 'get', '/api/users/subscriptions/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 4),
+    Endpoint('users_subscribe', 'post', '/api/users/{new_author}/subscribe/',
+             None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_201_CREATED, 0, 10),
+    Endpoint('users_unsubscribe', 'delete', '/api/users/{author}/subscribe/',
+             None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 6),
+    Endpoint('token_login', 'post', '/api/auth/token/login/',
+             lambda ids: {'email': 'viewer@foodgram.ru', 'password': PASSWORD},
+             status.HTTP_200_OK, status.HTTP_200_OK, 3, 4),
+    Endpoint('token_logout', 'post', '/api/auth/token/logout/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 3),
+    Endpoint('tags_list', 'get', '/api/tags/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 1, 2),
+    Endpoint('tags_retrieve', 'get', '/api/tags/{tag}/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 1, 2),
+    Endpoint('ingredients_list', 'get', '/api/ingredients/?name=Ингр', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 0, 1),
+    Endpoint('ingredients_retrieve', 'get', '/api/ingredients/{ingredient}/',
+             None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 0, 1),
+    Endpoint('recipes_list', 'get', '/api/recipes/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 4, 5),
+    Endpoint('recipes_list_filtered', 'get',
+             '/api/recipes/?tags=breakfast&tags=lunch&is_favorited=1'
+             '&is_in_shopping_cart=0',
+             None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 5, 6),
+    Endpoint('recipes_list_cursor', 'get', '/api/recipes/?cursor=', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 3, 4),
+    Endpoint('recipes_list_popular', 'get', '/api/recipes/?ordering=popular',
+             None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 4, 5),
+    Endpoint('recipes_list_popular_cursor', 'get',
+             '/api/recipes/?ordering=popular&cursor=', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 3, 4),
+    Endpoint('recipes_list_grid', 'get',
+             '/api/recipes/?fields=id,name,image,cooking_time', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 2, 2),
+    Endpoint('recipes_feed', 'get', '/api/recipes/feed/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 5),
+    Endpoint('recipes_feed_cursor', 'get', '/api/recipes/feed/?cursor=', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 5),
+    Endpoint('recipes_search', 'get', '/api/recipes/?search=рецепт', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 4, 5),
+    Endpoint('recipes_create', 'post', '/api/recipes/', recipe_payload,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_201_CREATED, 0, 16),
+    Endpoint('recipes_retrieve', 'get', '/api/recipes/{recipe}/', None,
+             status.HTTP_200_OK, status.HTTP_200_OK, 3, 4),
+    Endpoint('recipes_partial_update', 'patch', '/api/recipes/{own_recipe}/',
+             recipe_payload,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 19),
+    Endpoint('recipes_destroy', 'delete', '/api/recipes/{own_recipe}/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 15),
+    Endpoint('recipes_favorite', 'post', '/api/recipes/{recipe}/favorite/',
+             None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_201_CREATED, 0, 7),
+    Endpoint('recipes_unfavorite', 'delete',
+             '/api/recipes/{favorite_recipe}/favorite/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 6),
+    Endpoint('recipes_shopping_cart', 'post',
+             '/api/recipes/{recipe}/shopping_cart/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_201_CREATED, 0, 12),
+    Endpoint('recipes_shopping_cart_delete', 'delete',
+             '/api/recipes/{cart_recipe}/shopping_cart/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_204_NO_CONTENT, 0, 10),
+    Endpoint('recipes_shopping_cart_summary', 'get',
+             '/api/recipes/shopping_cart_summary/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 3),
+    Endpoint('recipes_favorite_batch', 'post', '/api/recipes/favorite/',
+             lambda ids: {
+                 'recipes': [ids['recipe'], ids['favorite_recipe']]
+             },
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 5),
+    Endpoint('recipes_unfavorite_batch', 'delete', '/api/recipes/favorite/',
+             lambda ids: {
+                 'recipes': [ids['recipe'], ids['favorite_recipe']]
+             },
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 5),
+    Endpoint('recipes_shopping_cart_batch', 'post',
+             '/api/recipes/shopping_cart/',
+             lambda ids: {'recipes': [ids['recipe'], ids['cart_recipe']]},
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 11),
+    Endpoint('recipes_shopping_cart_delete_batch', 'delete',
+             '/api/recipes/shopping_cart/',
+             lambda ids: {'recipes': [ids['recipe'], ids['cart_recipe']]},
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 11),
+    Endpoint('recipes_download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 2),
+    Endpoint('recipes_download_shopping_cart_csv', 'get',
+             '/api/recipes/download_shopping_cart/?format=csv', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 2),
+    Endpoint('recipes_download_shopping_cart_pdf', 'get',
+             '/api/recipes/download_shopping_cart/?format=pdf', None,
+             status.HTTP_401_UNAUTHORIZED, status.HTTP_200_OK, 0, 2),
+)
+
+
+# Кэш ответов для анонимов отключён: измеряется путь через базу данных.
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RESPONSE_CACHE_TIMEOUT=0)
+class QueryBudgetTestCase(TestCase):
+    """Потолок SQL-запросов и замер времени для всех эндпоинтов."""
+
+    timings = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email='viewer@foodgram.ru', username='viewer',
+            first_name='Зритель', last_name='Тестов', password=PASSWORD,
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@foodgram.ru',
+                username=f'author{number}',
+                first_name='Автор', last_name=f'№{number}',
+                password=PASSWORD,
+            )
+            for number in range(8)
+        ]
+        cls.new_author = User.objects.create_user(
+            email='new_author@foodgram.ru', username='new_author',
+            first_name='Новый', last_name='Автор', password=PASSWORD,
+        )
+        cls.token = Token.objects.create(user=cls.viewer)
+        tags = [
+            Tag.objects.create(name=slug, color=color, slug=slug)
+            for slug, color in (
+                ('breakfast', '#E26C2D'),
+                ('lunch', '#49B64E'),
+                ('dinner', '#8775D2'),
+            )
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        ingredients = list(Ingredient.objects.order_by('id'))
+        for author in cls.authors:
+            Follow.objects.create(user=cls.viewer, author=author)
+        recipes = []
+        for number in range(40):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'Рецепт {number}',
+                text='Описание рецепта',
+                cooking_time=number + 1,
+            )
+            recipe.tags.set(tags[number % 3:number % 3 + 2])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + shift) % 20],
+                    amount=shift * 100 + 50,
+                )
+                for shift in range(3)
+            )
+            recipes.append(recipe)
+        cls.own_recipe = Recipe.objects.create(
+            author=cls.viewer, name='Свой рецепт', text='Описание',
+            cooking_time=10,
+        )
+        cls.own_recipe.tags.set(tags[:1])
+        RecipeIngredient.objects.create(
+            recipe=cls.own_recipe, ingredient=ingredients[0], amount=1,
+        )
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=cls.viewer, recipe=recipe)
+            for recipe in recipes[:20]
+        )
+        for recipe in recipes[10:30]:
+            ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+        cls.ids = {
+            'viewer': cls.viewer.id,
+            'author': cls.authors[0].id,
+            'new_author': cls.new_author.id,
+            'recipe': recipes[-1].id,
+            'favorite_recipe': recipes[0].id,
+            'cart_recipe': recipes[15].id,
+            'own_recipe': cls.own_recipe.id,
+            'tag': tags[0].id,
+            'ingredient': ingredients[0].id,
+            'other_ingredient': ingredients[1].id,
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        if not os.getenv('UPDATE_PERF_BASELINE'):
+            return
+        baseline = {}
+        if BASELINE_FILE.exists():
+            baseline = json.loads(BASELINE_FILE.read_text(encoding='utf-8'))
+        baseline.update(cls.timings)
+        BASELINE_FILE.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True,
+                       ensure_ascii=False) + '\n',
+            encoding='utf-8',
+        )
+
+    def get_client(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return client
+
+    def measure(self, client, method, url, data=None):
+        """Выполнить запрос в откатываемой транзакции.
+
+        Возвращает ответ последнего повтора, число запросов к БД
+        и медианное время ответа в миллисекундах.
+        """
+        durations = []
+        for _ in range(REPEATS):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = perf_counter()
+                    response = getattr(client, method)(
+                        url, data, format='json'
+                    )
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    durations.append(perf_counter() - started)
+                transaction.set_rollback(True)
+        return response, len(queries), round(median(durations) * 1000, 2)
+
+    def check_endpoints(self, authenticated):
+        role = 'auth' if authenticated else 'anon'
+        client = self.get_client(authenticated)
+        for endpoint in ENDPOINTS:
+            with self.subTest(endpoint=endpoint.name, role=role):
+                url = endpoint.url.format(**self.ids)
+                data = endpoint.data(self.ids) if endpoint.data else None
+                response, queries, duration = self.measure(
+                    client, endpoint.method, url, data
+                )
+                self.timings[f'{endpoint.name}.{role}'] = duration
+                expected_status, max_queries = (
+                    (endpoint.auth_status, endpoint.auth_max)
+                    if authenticated
+                    else (endpoint.anon_status, endpoint.anon_max)
+                )
+                self.assertEqual(
+                    response.status_code, expected_status,
+                    getattr(response, 'data', None)
+                )
+                self.assertLessEqual(queries, max_queries)
+
+    def assertQueriesIndependentOfPageSize(self, url, authenticated):
+        client = self.get_client(authenticated)
+        separator = '&' if '?' in url else '?'
+        _, small, _ = self.measure(
+            client, 'get', f'{url}{separator}limit={SMALL_PAGE}'
+        )
+        response, large, _ = self.measure(
+            client, 'get', f'{url}{separator}limit={LARGE_PAGE}'
+        )
+        self.assertGreater(len(response.data['results']), SMALL_PAGE)
+        self.assertEqual(small, large)
+
+    def test_endpoints_anonymous(self):
+        self.check_endpoints(authenticated=False)
+
+    def test_endpoints_authenticated(self):
+        self.check_endpoints(authenticated=True)
+
+    def test_recipes_list_page_size_anonymous(self):
+        self.assertQueriesIndependentOfPageSize('/api/recipes/', False)
+
+    def test_recipes_list_page_size_authenticated(self):
+        self.assertQueriesIndependentOfPageSize('/api/recipes/', True)
+
+    def test_recipes_filtered_page_size_authenticated(self):
+        self.assertQueriesIndependentOfPageSize(
+            '/api/recipes/?tags=breakfast&tags=lunch&is_in_shopping_cart=1',
+            True,
+        )
+
+    def test_recipes_search_page_size_authenticated(self):
+        self.assertQueriesIndependentOfPageSize(
+            '/api/recipes/?search=рецепт', True
+        )
+
+    def test_recipes_cursor_page_size_authenticated(self):
+        self.assertQueriesIndependentOfPageSize('/api/recipes/?cursor=', True)
+
+    def test_recipes_feed_page_size(self):
+        self.assertQueriesIndependentOfPageSize('/api/recipes/feed/', True)
+
+    def test_users_list_page_size_anonymous(self):
+        self.assertQueriesIndependentOfPageSize('/api/users/', False)
+
+    def test_users_list_page_size_authenticated(self):
+        self.assertQueriesIndependentOfPageSize('/api/users/', True)
+
+    def test_subscriptions_page_size(self):
+        self.assertQueriesIndependentOfPageSize(
+            '/api/users/subscriptions/', True
+        )
+
+    def test_subscriptions_cursor_page_size(self):
+        self.assertQueriesIndependentOfPageSize(
+            '/api/users/subscriptions/?cursor=', True
+        )
+
+    def test_subscriptions_recipes_limit(self):
+        client = self.get_client(authenticated=True)
+        response = client.get('/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 2)
+            self.assertEqual(author['recipes_count'], 5)
+        for limit in ('abc', '-1'):
+            with self.subTest(recipes_limit=limit):
+                response = client.get(
+                    f'/api/users/subscriptions/?recipes_limit={limit}'
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
@@ -0,0 +1,142 @@
+import base64
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+from api.images import MAX_ATTEMPTS, VARIANT_KEYS, VARIANTS
+from api.models import ImageJob, Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def encode_image(size, color, image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImageTestCase(TestCase):
+    """Очередь нарезки изображений рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def payload(self, image):
+        return {
+            'ingredients': [{'id': self.ingredient.id, 'amount': 10}],
+            'tags': [self.tag.id],
+            'image': image,
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+
+    def process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_images', once=True, stdout=io.StringIO())
+
+    def test_upload_is_queued_and_served_as_original(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.payload(encode_image((1200, 900), 'red')),
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(recipe.image_job.source, recipe.image.name)
+        self.assertEqual(
+            set(response.data['images'].values()), {response.data['image']}
+        )
+
+    def test_worker_renders_variants(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.payload(encode_image((1200, 900), 'red')),
+            format='json',
+        )
+        url = f'/api/recipes/{response.data["id"]}/'
+        APIClient().get(url)
+        self.process()
+        self.assertFalse(ImageJob.objects.exists())
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        for key in VARIANT_KEYS:
+            name, _, extension = key.partition('_')
+            path = Path(MEDIA_ROOT) / recipe.image_variants[key]
+            with self.subTest(variant=key), Image.open(path) as image:
+                self.assertEqual(image.format, 'WEBP' if extension else 'JPEG')
+                self.assertLessEqual(image.width, VARIANTS[name][0])
+                self.assertEqual(image.width * 3, image.height * 4)
+        for client in (self.client, APIClient()):
+            response = client.get(url)
+            self.assertTrue(
+                response.data['images']['card_webp'].endswith('_card.webp')
+            )
+
+    def test_new_upload_replaces_variants(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.payload(encode_image((800, 800), 'red')),
+            format='json',
+        )
+        self.process()
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        old_variants = recipe.image_variants
+        self.client.patch(
+            f'/api/recipes/{recipe.id}/',
+            self.payload(encode_image((800, 800), 'blue')),
+            format='json',
+        )
+        self.process()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants['source'], recipe.image.name)
+        for key in VARIANT_KEYS:
+            with self.subTest(variant=key):
+                self.assertFalse(
+                    (Path(MEDIA_ROOT) / old_variants[key]).exists()
+                )
+                self.assertTrue(
+                    (Path(MEDIA_ROOT) / recipe.image_variants[key]).exists()
+                )
+
+    def test_broken_image_is_retried_and_kept(self):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=5,
+            image=ContentFile(b'not an image', name='broken.png'),
+        )
+        self.process()
+        job = recipe.image_job
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+        self.assertTrue(job.error)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image_variants, {})
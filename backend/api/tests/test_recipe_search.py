@@ -0,0 +1,57 @@
+from api.models import Recipe
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipeSearchTestCase(TestCase):
+    """Полнотекстовый поиск рецептов по названию и описанию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.borsch = Recipe.objects.create(
+            author=author, name='Борщ', cooking_time=90,
+            text='Свекла, капуста и говядина.',
+        )
+        cls.salad = Recipe.objects.create(
+            author=author, name='Винегрет', cooking_time=30,
+            text='Салат со свеклой и огурцами. Подавать к борщу.',
+        )
+        cls.pie = Recipe.objects.create(
+            author=author, name='Пирог с капустой', cooking_time=60,
+            text='Тесто и капуста.',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_match_ranks_above_text_match(self):
+        self.assertEqual(
+            self.search('борщ'), [self.borsch.id, self.salad.id]
+        )
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('тесто капуста'), [self.pie.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.pie.name = 'Кулебяка'
+        self.pie.text = 'Тесто и рыба.'
+        self.pie.save()
+        self.assertEqual(self.search('кулебяка'), [self.pie.id])
+        self.assertEqual(self.search('капуста'), [self.borsch.id])
+        self.borsch.delete()
+        self.assertEqual(self.search('капуста'), [])
+
+    def test_empty_search_returns_all(self):
+        self.assertEqual(len(self.search(' ')), 3)
@@ -0,0 +1,171 @@
+import shutil
+import tempfile
+
+from api.models import Ingredient, Recipe, RecipeIngredient, Tag
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteTestCase(TestCase):
+    """Создание и редактирование рецепта за постоянное число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.tags = [
+            Tag.objects.create(name=slug, color=color, slug=slug)
+            for slug, color in (
+                ('breakfast', '#E26C2D'),
+                ('lunch', '#49B64E'),
+                ('dinner', '#8775D2'),
+            )
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def payload(self, ingredients, tags):
+        return {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+            'tags': [tag.id for tag in tags],
+            'image': IMAGE,
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+
+    def send(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, len(queries)
+
+    def create(self, ingredients, tags):
+        response, queries = self.send(
+            'post', '/api/recipes/', self.payload(ingredients, tags)
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED, response.data
+        )
+        return Recipe.objects.get(pk=response.data['id']), queries
+
+    def rows(self, recipe):
+        return dict(
+            recipe.recipeingredients.values_list('ingredient_id', 'amount')
+        )
+
+    def test_create_queries_do_not_depend_on_size(self):
+        _, small = self.create([(self.ingredients[0], 10)], self.tags[:1])
+        recipe, large = self.create(
+            [(ingredient, 10) for ingredient in self.ingredients], self.tags
+        )
+        self.assertEqual(small, large)
+        self.assertEqual(len(self.rows(recipe)), len(self.ingredients))
+        self.assertEqual(recipe.tags.count(), len(self.tags))
+
+    def test_update_writes_only_the_difference(self):
+        first, second, third, fourth = self.ingredients[:4]
+        recipe, _ = self.create(
+            [(first, 10), (second, 20), (third, 30)], self.tags[:2]
+        )
+        kept = recipe.recipeingredients.get(ingredient=first).id
+        response, _ = self.send(
+            'patch', f'/api/recipes/{recipe.id}/',
+            self.payload([(first, 10), (second, 25), (fourth, 40)],
+                         self.tags[1:]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.rows(recipe),
+            {first.id: 10, second.id: 25, fourth.id: 40},
+        )
+        self.assertEqual(
+            recipe.recipeingredients.get(ingredient=first).id, kept
+        )
+        self.assertEqual(
+            sorted(recipe.tags.values_list('id', flat=True)),
+            [tag.id for tag in self.tags[1:]],
+        )
+        self.assertEqual(
+            {
+                item['id']: item['amount']
+                for item in response.data['ingredients']
+            },
+            {first.id: 10, second.id: 25, fourth.id: 40},
+        )
+
+    def test_update_queries_do_not_depend_on_size(self):
+        small_recipe, _ = self.create(
+            [(ingredient, 10) for ingredient in self.ingredients[:2]],
+            self.tags[:1],
+        )
+        large_recipe, _ = self.create(
+            [(ingredient, 10) for ingredient in self.ingredients[:10]],
+            self.tags[:1],
+        )
+        counts = []
+        for recipe, ingredients in (
+            (small_recipe, [self.ingredients[1], self.ingredients[2]]),
+            (large_recipe, self.ingredients[5:20]),
+        ):
+            response, queries = self.send(
+                'patch', f'/api/recipes/{recipe.id}/',
+                self.payload(
+                    [(ingredient, 20) for ingredient in ingredients],
+                    self.tags[1:],
+                ),
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(queries)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_duplicate_ingredients_are_rejected(self):
+        data = self.payload(
+            [(self.ingredients[0], 10), (self.ingredients[0], 20)],
+            self.tags[:1],
+        )
+        response, _ = self.send('post', '/api/recipes/', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', response.data)
+
+    def test_unknown_ids_are_reported_at_once(self):
+        data = self.payload([(self.ingredients[0], 10)], self.tags[:1])
+        data['ingredients'] += [
+            {'id': 9001, 'amount': 1}, {'id': 9002, 'amount': 1},
+        ]
+        data['tags'] += [8001, 8002]
+        response, _ = self.send('post', '/api/recipes/', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9001, 9002', str(response.data['ingredients']))
+        self.assertIn('8001, 8002', str(response.data['tags']))
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(RecipeIngredient.objects.exists())
@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from api.models import Recipe
+from api.replica import (REPLICA, ReplicaMiddleware, ReplicaRouter,
+                         current_request, pin_to_primary)
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ReplicaRouterTestCase(SimpleTestCase):
+    """Выбор базы для чтения в зависимости от запроса."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = SimpleNamespace(pk=-1, is_authenticated=True)
+
+    def read_from(self, request, model=Recipe):
+        token = current_request.set(request)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            current_request.reset(token)
+
+    def test_safe_request_reads_from_replica(self):
+        request = self.factory.get('/api/recipes/')
+        request.user = AnonymousUser()
+        self.assertEqual(self.read_from(request), REPLICA)
+
+    def test_primary_is_used(self):
+        get = self.factory.get('/api/recipes/')
+        get.user = AnonymousUser()
+        post = self.factory.post('/api/recipes/')
+        post.user = AnonymousUser()
+        cases = (
+            ('без запроса', None, Recipe),
+            ('запись', post, Recipe),
+            ('токены', get, Token),
+        )
+        for name, request, model in cases:
+            with self.subTest(name):
+                self.assertEqual(
+                    self.read_from(request, model), DEFAULT_DB_ALIAS
+                )
+        self.assertEqual(self.router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_writer_is_pinned_to_primary(self):
+        request = self.factory.get('/api/recipes/')
+        request.user = self.user
+        self.assertEqual(self.read_from(request), REPLICA)
+        middleware = ReplicaMiddleware(lambda request: HttpResponse())
+        post = self.factory.post('/api/recipes/')
+        post.user = self.user
+        middleware(post)
+        request = self.factory.get('/api/recipes/')
+        request.user = self.user
+        self.assertEqual(self.read_from(request), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_PIN_SECONDS=-1)
+    def test_pin_expires(self):
+        pin_to_primary(self.user)
+        request = self.factory.get('/api/recipes/')
+        request.user = self.user
+        self.assertEqual(self.read_from(request), REPLICA)
+
+
+# В тестах реплика — зеркало основной базы, а данные должны быть
+# зафиксированы, чтобы второе соединение их видело.
+@skipUnless(REPLICA in settings.DATABASES, 'Реплика не настроена')
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """Запросы API читают с реплики, пока пользователь ничего не пишет."""
+
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def request(self, method, url, data=None):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = getattr(self.client, method)(
+                    url, data, format='json'
+                )
+        return response, len(primary), len(replica)
+
+    def test_reads_go_to_replica_until_write(self):
+        response, _, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(replica, 0)
+        response, _, replica = self.request('patch', '/api/users/me/', {})
+        self.assertEqual(replica, 0)
+        response, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 1)
+
+    def test_session_reads_user_from_primary(self):
+        client = APIClient()
+        client.force_login(self.user)
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(replica), 0)
+        self.assertFalse([
+            query for query in replica.captured_queries
+            if User._meta.db_table in query['sql']
+        ])
+        client.patch('/api/users/me/', {}, format='json')
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(replica), 0)
@@ -0,0 +1,154 @@
+import io
+
+from api.models import Ingredient, Recipe, RecipeIngredient, Tag
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class AnonymousResponseCacheTestCase(TestCase):
+    """Кэш списка и страницы рецепта для анонимных пользователей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass',
+            first_name='Автор',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=5,
+            )
+            recipe.tags.set([cls.tag])
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=10
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url, client=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def assertCached(self, url, cached=True):
+        response, queries = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT' if cached else 'MISS')
+        if cached:
+            self.assertEqual(queries, 0)
+        return response
+
+    def test_list_is_served_from_cache(self):
+        first = self.assertCached('/api/recipes/?tags=lunch&page=1', False)
+        second = self.assertCached('/api/recipes/?page=1&tags=lunch')
+        self.assertEqual(first.data, second.data)
+        self.assertCached('/api/recipes/?page=2&tags=lunch&limit=1', False)
+
+    def test_recipe_change_invalidates_only_its_detail(self):
+        changed, untouched = self.recipes[:2]
+        for recipe in (changed, untouched):
+            self.assertCached(f'/api/recipes/{recipe.id}/', False)
+        self.assertCached('/api/recipes/', False)
+        changed.name = 'Новое название'
+        changed.save()
+        response = self.assertCached(f'/api/recipes/{changed.id}/', False)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertCached(f'/api/recipes/{untouched.id}/')
+        self.assertCached('/api/recipes/', False)
+
+    def test_ingredient_amount_change_invalidates_detail(self):
+        recipe = self.recipes[0]
+        self.assertCached(f'/api/recipes/{recipe.id}/', False)
+        row = recipe.recipeingredients.get()
+        row.amount = 20
+        row.save()
+        response = self.assertCached(f'/api/recipes/{recipe.id}/', False)
+        self.assertEqual(response.data['ingredients'][0]['amount'], 20)
+
+    def test_tag_and_author_changes_invalidate(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        self.assertCached(url, False)
+        self.tag.name = 'Ужин'
+        self.tag.save()
+        self.assertCached(url, False)
+        self.author.refresh_from_db()
+        self.author.last_login = self.author.date_joined
+        self.author.save(update_fields=['last_login'])
+        self.assertCached(url)
+        self.author.first_name = 'Шеф'
+        self.author.save()
+        response = self.assertCached(url, False)
+        self.assertEqual(response.data['author']['first_name'], 'Шеф')
+
+    def test_authenticated_requests_bypass_cache(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        self.assertCached('/api/recipes/', False)
+        for _ in range(2):
+            response, queries = self.get('/api/recipes/', client)
+            self.assertNotIn('X-Cache', response)
+            self.assertGreater(queries, 0)
+
+    def test_stats_command(self):
+        call_command('cache_stats', reset=True, stdout=io.StringIO())
+        self.assertCached('/api/recipes/', False)
+        self.assertCached('/api/recipes/')
+        self.assertCached('/api/recipes/')
+        stdout = io.StringIO()
+        call_command('cache_stats', stdout=stdout)
+        self.assertIn(
+            'Попаданий: 2, промахов: 1, доля попаданий: 66.7%',
+            stdout.getvalue()
+        )
+
+    def test_counter_changes_invalidate_list(self):
+        reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader', password='pass'
+        )
+        client = APIClient()
+        client.force_authenticate(reader)
+        recipe = self.recipes[0]
+        url = '/api/recipes/?limit=6'
+        actions = (
+            ('избранное', f'/api/recipes/{recipe.id}/favorite/'),
+            ('список покупок', f'/api/recipes/{recipe.id}/shopping_cart/'),
+            ('подписка', f'/api/users/{self.author.id}/subscribe/'),
+            ('пакетное избранное', '/api/recipes/favorite/'),
+        )
+        for name, action in actions:
+            with self.subTest(name):
+                self.assertCached(url, False)
+                self.assertCached(url)
+                data = (
+                    {'recipes': [self.recipes[1].id]}
+                    if name.startswith('пакетное') else None
+                )
+                response = client.post(action, data, format='json')
+                self.assertEqual(
+                    response.status_code // 100, 2, response.data
+                )
+        response = self.assertCached(url, False)
+        counts = {item['id']: item for item in response.data['results']}
+        self.assertEqual(counts[recipe.id]['favorites_count'], 1)
+        self.assertEqual(counts[recipe.id]['in_carts_count'], 1)
+        self.assertEqual(counts[self.recipes[1].id]['favorites_count'], 1)
+        self.assertEqual(
+            counts[recipe.id]['author']['followers_count'], 1
+        )
@@ -0,0 +1,240 @@
+import csv
+import io
+
+from api.cart import rebuild
+from api.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                        ShoppingListItem)
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models.signals import pre_delete
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListDownloadTestCase(TestCase):
+    """Потоковая выгрузка списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.token = Token.objects.create(user=user)
+        flour = Ingredient.objects.create(name='Мука', measurement_unit='г')
+        eggs = Ingredient.objects.create(name='Яйца', measurement_unit='шт')
+        for amount in (200, 300):
+            recipe = Recipe.objects.create(
+                author=user, name='Блины', text='Текст', cooking_time=20
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, amount=amount
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=eggs, amount=2
+            )
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def download(self, file_format=None):
+        response = self.client.get(
+            URL, {'format': file_format} if file_format else {}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt_is_default(self):
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(
+            content.decode(),
+            'Список покупок:\nМука (г) - 500\nЯйца (шт) - 4\n',
+        )
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[1:], [['Мука', 'г', '500'], ['Яйца', 'шт', '4']])
+
+    def test_pdf(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        self.assertIn(r'Мука \(г\) - 500'.encode('cp1251'), content)
+        xref_offset = int(content.rsplit(b'startxref\n', 1)[1].split()[0])
+        self.assertTrue(content[xref_offset:].startswith(b'xref'))
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {'format': 'docx'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ShoppingListItemsTestCase(TestCase):
+    """Материализованный список покупок и сводка по нему."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.flour_kg = Ingredient.objects.create(
+            name='Мука', measurement_unit='кг'
+        )
+        cls.flour_g = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.eggs = Ingredient.objects.create(
+            name='Яйца', measurement_unit='шт.'
+        )
+        cls.milk = Ingredient.objects.create(
+            name='Молоко', measurement_unit='л'
+        )
+        cls.bread = cls.recipe({cls.flour_kg: 1, cls.eggs: 2})
+        cls.pancakes = cls.recipe({cls.flour_g: 300, cls.milk: 1})
+
+    @classmethod
+    def recipe(cls, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=20
+        )
+        for ingredient, amount in amounts.items():
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def lines(self):
+        return list(
+            self.user.shopping_list_items.values_list(
+                'name', 'measurement_unit', 'amount'
+            )
+        )
+
+    def add(self, recipe):
+        response = self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_units_are_folded_on_add_and_remove(self):
+        self.add(self.bread)
+        self.add(self.pancakes)
+        self.assertEqual(self.lines(), [
+            ('Молоко', 'мл', 1000), ('Мука', 'г', 1300), ('Яйца', 'шт', 2),
+        ])
+        self.client.delete(f'/api/recipes/{self.bread.id}/shopping_cart/')
+        self.assertEqual(
+            self.lines(), [('Молоко', 'мл', 1000), ('Мука', 'г', 300)]
+        )
+
+    def test_recipe_edit_updates_lines(self):
+        self.add(self.bread)
+        response = self.client.patch(
+            f'/api/recipes/{self.bread.id}/',
+            {
+                'ingredients': [{'id': self.flour_g.id, 'amount': 500}],
+                'tags': [], 'name': 'Хлеб', 'text': 'Текст',
+                'cooking_time': 30,
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.lines(), [('Мука', 'г', 500)])
+
+    def test_ingredient_edit_and_recipe_delete(self):
+        self.add(self.bread)
+        self.add(self.pancakes)
+        self.eggs.name = 'Куриные яйца'
+        self.eggs.save()
+        self.assertIn(('Куриные яйца', 'шт', 2), self.lines())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pancakes.delete()
+        self.assertEqual(
+            self.lines(), [('Куриные яйца', 'шт', 2), ('Мука', 'г', 1000)]
+        )
+
+    def test_ingredient_save_rebuilds_only_its_names(self):
+        self.add(self.bread)
+        self.add(self.pancakes)
+        items = self.user.shopping_list_items
+        with CaptureQueriesContext(connection) as context:
+            self.milk.save()
+        self.assertFalse(any(
+            items.model._meta.db_table in query['sql']
+            for query in context.captured_queries
+        ))
+        flour = items.get(name='Мука').pk
+        self.milk.name = 'Сливки'
+        self.milk.save()
+        self.assertEqual(self.lines(), [
+            ('Мука', 'г', 1300), ('Сливки', 'мл', 1000), ('Яйца', 'шт', 2),
+        ])
+        self.assertEqual(items.get(name='Мука').pk, flour)
+
+    def test_failed_delete_does_not_skip_later_changes(self):
+        def fail(sender, **kwargs):
+            raise RuntimeError
+
+        pre_delete.connect(fail, sender=Recipe)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.bread.delete()
+        finally:
+            pre_delete.disconnect(fail, sender=Recipe)
+        self.add(self.bread)
+        self.assertEqual(
+            self.lines(), [('Мука', 'г', 1000), ('Яйца', 'шт', 2)]
+        )
+
+    def test_deleting_recipes_rebuilds_lists_once(self):
+        self.add(self.bread)
+        self.add(self.pancakes)
+        table = ShoppingListItem._meta.db_table
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                Recipe.objects.filter(
+                    pk__in=[self.bread.pk, self.pancakes.pk]
+                ).delete()
+        self.assertEqual(self.lines(), [])
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if query['sql'].startswith(f'DELETE FROM "{table}"')
+        ]), 1)
+
+    def test_rebuild_after_bulk_create(self):
+        ShoppingCart.objects.bulk_create([
+            ShoppingCart(user=self.user, recipe=self.bread)
+        ])
+        self.assertEqual(self.lines(), [])
+        rebuild([self.user.id], DEFAULT_DB_ALIAS)
+        self.assertEqual(
+            self.lines(), [('Мука', 'г', 1000), ('Яйца', 'шт', 2)]
+        )
+
+    def test_summary(self):
+        self.add(self.bread)
+        response = self.client.get('/api/recipes/shopping_cart_summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'recipes_count': 1,
+            'ingredients': [
+                {'name': 'Мука', 'measurement_unit': 'г', 'amount': 1000},
+                {'name': 'Яйца', 'measurement_unit': 'шт', 'amount': 2},
+            ],
+        })
+        self.assertFalse(ShoppingListItem.objects.exclude(
+            user=self.user
+        ).exists())
@@ -0,0 +1,100 @@
+from api.models import (Follow, Ingredient, Recipe, RecipeIngredient,
+                        ShoppingCart, Tag)
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+User = get_user_model()
+GRID_FIELDS = ['id', 'name', 'image', 'cooking_time']
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class SparseFieldsTestCase(TestCase):
+    """Поля ответа по ?fields= и ?omit= и запросы только для них."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Длинное описание', cooking_time=5,
+            )
+            recipe.tags.set([tag])
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=salt, amount=1
+            )
+        cls.recipe = recipe
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [query['sql'] for query in context]
+
+    def test_recipe_grid_fields(self):
+        data, full_queries = self.get('/api/recipes/')
+        data, queries = self.get(
+            '/api/recipes/?fields={}'.format(','.join(GRID_FIELDS))
+        )
+        self.assertEqual(list(data['results'][0]), GRID_FIELDS)
+        self.assertLess(len(queries), len(full_queries))
+        sql = '\n'.join(queries)
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('EXISTS', sql)
+        self.assertNotIn(RecipeIngredient._meta.db_table, sql)
+
+    def test_omit(self):
+        data, queries = self.get(
+            f'/api/recipes/{self.recipe.id}/?omit=ingredients,text,author'
+        )
+        self.assertNotIn('ingredients', data)
+        self.assertNotIn('author', data)
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertEqual(data['tags'][0]['slug'], 'lunch')
+        sql = '\n'.join(queries)
+        self.assertNotIn(RecipeIngredient._meta.db_table, sql)
+        self.assertNotIn(Follow._meta.db_table, sql)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/recipes/?fields=id,calories')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('calories', response.data['fields'])
+
+    def test_empty_selection(self):
+        for query in ('fields=', 'fields=,%20,', 'omit=id,name&fields=id'):
+            with self.subTest(query):
+                response = self.client.get(f'/api/recipes/?{query}')
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn('fields', response.data)
+
+    def test_user_fields(self):
+        data, queries = self.get('/api/users/?fields=id,username')
+        self.assertEqual(list(data['results'][0]), ['id', 'username'])
+        self.assertNotIn(Follow._meta.db_table, '\n'.join(queries))
+
+    def test_subscriptions_without_recipes(self):
+        data, full_queries = self.get('/api/users/subscriptions/')
+        self.assertIn('recipes', data['results'][0])
+        data, queries = self.get('/api/users/subscriptions/?omit=recipes')
+        self.assertNotIn('recipes', data['results'][0])
+        self.assertTrue(data['results'][0]['is_subscribed'])
+        self.assertLess(len(queries), len(full_queries))
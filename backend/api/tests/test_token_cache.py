@@ -0,0 +1,86 @@
+from api.models import Recipe
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """Токен берётся из кэша и сбрасывается при изменении пользователя."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def me(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+        token_queries = [
+            query for query in queries
+            if 'authtoken_token' in query['sql']
+        ]
+        return response, len(token_queries)
+
+    def assertCached(self, cached=True):
+        response, token_queries = self.me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_queries, 0 if cached else 1)
+        return response
+
+    def assertRejected(self):
+        response, _ = self.me()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_second_request_skips_token_query(self):
+        self.assertCached(False)
+        self.assertCached()
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.assertCached(False)
+        self.assertCached(False)
+
+    def test_logout(self):
+        self.assertCached(False)
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertRejected()
+
+    def test_token_deleted(self):
+        self.assertCached(False)
+        Token.objects.filter(user=self.user).delete()
+        self.assertRejected()
+
+    def test_user_deactivated(self):
+        self.assertCached(False)
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected()
+
+    def test_password_changed(self):
+        self.assertCached(False)
+        response = self.client.post(
+            '/api/users/set_password/',
+            {'current_password': 'pass', 'new_password': 'Nw-pass-123'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertCached(False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Nw-pass-123'))
+
+    def test_counters_are_fresh(self):
+        self.assertCached(False)
+        Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание', cooking_time=5
+        )
+        response = self.assertCached(False)
+        self.assertEqual(response.json()['recipes_count'], 1)
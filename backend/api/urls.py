@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 app_name = 'api'
@@ -10,7 +12,19 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 
+# Под ASGI эти адреса обслуживают асинхронные представления; остальные
+# запросы, включая те же адреса с суффиксом формата, идут в роутер.
+async_urlpatterns = [
+    path('ingredients/', async_views.ingredients),
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart
+    ),
+    path('recipes/<int:pk>/', async_views.recipe),
+]
+
 urlpatterns = [
+    *(async_urlpatterns if settings.ASYNC_VIEWS else ()),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,8 +1,21 @@
-from django.shortcuts import get_object_or_404
+from django.db import connections, router, transaction
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from .models import Ingredient, RecipeIngredient
+from .cart import add_recipes, collect_changes, rebuild_for_recipe
+from .counters import update_counters
+from .models import Recipe, RecipeIngredient, ShoppingCart
+from .versions import RECIPES, bump_version, recipe_version
+
+RECIPES_LIMIT = 10
+MAX_RECIPES_LIMIT = 50
+MAX_BATCH_SIZE = 100
+# Статус id в ответе пакетной операции: рецепта нет, он не был или уже
+# был у пользователя.
+ADD_STATUSES = {None: 'not_found', False: 'added', True: 'exists'}
+DELETE_STATUSES = {None: 'not_found', False: 'missing', True: 'removed'}
 
 
 def create_model_instance(request, instance, serializer_name):
@@ -32,18 +45,184 @@ def delete_model_instance(request, model_name, instance, error_message):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def create_ingredients(ingredients, recipe):
-    """Добавление ингредиентов при создании и редактировании рецепта."""
+def existing_recipes(recipe_ids, using):
+    return set(
+        Recipe.objects.using(using).filter(pk__in=recipe_ids).values_list(
+            'id', flat=True
+        )
+    )
+
+
+def returning(using, sql, params):
+    """id рецептов из RETURNING запроса, изменившего строки."""
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def recipes_changed(user, model_name, recipe_ids, delta, using):
+    """Работа сигналов для строк, записанных или удалённых пачкой."""
+
+    if not recipe_ids:
+        return
+    update_counters(model_name, recipe_ids, delta, using)
+    if model_name is ShoppingCart:
+        add_recipes(user.id, recipe_ids, delta, using)
+    bump_version(RECIPES, *map(recipe_version, recipe_ids))
+
+
+def batch_response(recipe_ids, present, statuses):
+    return Response({
+        'results': [
+            {'id': pk, 'status': statuses[present.get(pk)]}
+            for pk in recipe_ids
+        ]
+    })
+
+
+def create_model_instances(request, model_name, recipe_ids):
+    """Пакетное добавление рецептов в избранное или в список покупок.
+
+    Строки пишутся одним INSERT ... ON CONFLICT DO NOTHING RETURNING, который
+    не вызывает сигналы: счётчики, версии и список покупок обновляются
+    recipes_changed только по действительно вставленным строкам, так что
+    параллельные запросы одного пользователя не посчитают рецепт дважды.
+    """
+
+    using = router.db_for_write(model_name)
+    connection = connections[using]
+    ids = list(dict.fromkeys(recipe_ids))
+    with transaction.atomic(using=using):
+        added = returning(
+            using,
+            f'INSERT INTO {model_name._meta.db_table} '
+            '(user_id, recipe_id, created) '
+            f'SELECT %s, id, %s FROM {Recipe._meta.db_table} '
+            f'WHERE id IN ({", ".join(["%s"] * len(ids))}) '
+            'ON CONFLICT DO NOTHING RETURNING recipe_id',
+            [
+                request.user.id,
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                *ids,
+            ]
+        )
+        recipes_changed(request.user, model_name, added, 1, using)
+        present = dict.fromkeys(
+            existing_recipes(set(ids) - set(added), using), True
+        )
+    present.update(dict.fromkeys(added, False))
+    return batch_response(recipe_ids, present, ADD_STATUSES)
+
 
-    ingredient_list = [
+def delete_model_instances(request, model_name, recipe_ids):
+    """Пакетное удаление рецептов из избранного или из списка покупок.
+
+    Один DELETE ... RETURNING без выборки строк и сигналов по каждой из них.
+    """
+
+    using = router.db_for_write(model_name)
+    ids = list(dict.fromkeys(recipe_ids))
+    with transaction.atomic(using=using):
+        removed = returning(
+            using,
+            f'DELETE FROM {model_name._meta.db_table} WHERE user_id = %s '
+            f'AND recipe_id IN ({", ".join(["%s"] * len(ids))}) '
+            'RETURNING recipe_id',
+            [request.user.id, *ids]
+        )
+        recipes_changed(request.user, model_name, removed, -1, using)
+        present = dict.fromkeys(
+            existing_recipes(set(ids) - set(removed), using), False
+        )
+    present.update(dict.fromkeys(removed, True))
+    return batch_response(recipe_ids, present, DELETE_STATUSES)
+
+
+def set_ingredients(recipe, ingredients, created=False):
+    """Ингредиенты рецепта при создании и редактировании.
+
+    Пишется только разница с текущим составом: новые строки добавляются,
+    у изменившихся обновляется количество, убранные удаляются.
+    """
+
+    amounts = {
+        ingredient['id']: ingredient['amount'] for ingredient in ingredients
+    }
+    current = {} if created else {
+        row.ingredient_id: row for row in recipe.recipeingredients.all()
+    }
+    removed = [
+        row.id for ingredient_id, row in current.items()
+        if ingredient_id not in amounts
+    ]
+    changed = []
+    for ingredient_id, row in current.items():
+        amount = amounts.get(ingredient_id, row.amount)
+        if row.amount != amount:
+            row.amount = amount
+            changed.append(row)
+    added = [
         RecipeIngredient(
             recipe=recipe,
-            ingredient=get_object_or_404(
-                Ingredient,
-                id=ingredient.get('id')),
-            amount=ingredient.get('amount')
+            ingredient_id=ingredient_id,
+            amount=amount
         )
-        for ingredient in ingredients
+        for ingredient_id, amount in amounts.items()
+        if ingredient_id not in current
     ]
+    with collect_changes():
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if not created and (changed or added):
+            rebuild_for_recipe(
+                recipe.id, router.db_for_write(RecipeIngredient),
+                [row.ingredient_id for row in (*changed, *added)]
+            )
+
+
+def get_recipes_limit(request):
+    """Число рецептов автора в подписках из параметра recipes_limit."""
+
+    limit = request.query_params.get('recipes_limit', RECIPES_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            {'recipes_limit': 'Должно быть целым числом'}
+        )
+    if limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Не может быть отрицательным'}
+        )
+    return min(limit, MAX_RECIPES_LIMIT)
+
+
+def get_recipes_preview(author_ids, limit):
+    """Первые рецепты каждого автора одним запросом с ROW_NUMBER()."""
 
-    RecipeIngredient.objects.bulk_create(ingredient_list)
+    preview = {author_id: [] for author_id in author_ids}
+    if not author_ids or not limit:
+        return preview
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    recipes = Recipe.objects.raw(
+        'SELECT id, author_id, name, image, image_variants, cooking_time'
+        ' FROM ('
+        '    SELECT id, author_id, name, image, image_variants, cooking_time,'
+        '           ROW_NUMBER() OVER ('
+        '               PARTITION BY author_id ORDER BY id DESC'
+        '           ) AS recipe_rank'
+        f'    FROM {Recipe._meta.db_table}'
+        f'    WHERE author_id IN ({placeholders})'
+        ') AS ranked '
+        'WHERE recipe_rank <= %s '
+        'ORDER BY author_id, id DESC',
+        [*author_ids, limit]
+    )
+    for recipe in recipes:
+        preview[recipe.author_id].append(recipe)
+    return preview
@@ -0,0 +1,63 @@
+"""Версии данных, общие для всех воркеров.
+
+Версия хранится в общем кэше и меняется при каждой записи в связанные
+модели. Воркер сравнивает её со своей копией и перестраивает локальные
+структуры только при расхождении.
+"""
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+RECIPES = 'recipes'
+AUTHORS = 'authors'
+VERSION_KEY = 'version:{}'
+
+
+def recipe_version(pk):
+    """Имя версии одного рецепта."""
+
+    return f'recipe-{pk}'
+
+
+def get_version(name):
+    """Текущая версия данных; если её нет в кэше, создаётся новая."""
+
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    """Версии нескольких наборов данных одним обращением к кэшу."""
+
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_version(name)
+        for key, name in zip(keys, names)
+    ]
+
+
+def set_new_versions(names):
+    cache.set_many(
+        {VERSION_KEY.format(name): uuid4().hex for name in names},
+        timeout=None
+    )
+
+
+def bump_version(*names):
+    """Сменить версии сейчас и ещё раз после фиксации транзакции.
+
+    Повторная смена не даёт воркеру закэшировать данные, прочитанные
+    до фиксации транзакции, под новой версией.
+    """
+
+    set_new_versions(names)
+    transaction.on_commit(partial(set_new_versions, names))
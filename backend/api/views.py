@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -10,26 +11,58 @@ from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import (FavoriteRecipe, Follow, Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Tag)
-from .pagination import CustomPagination
+from .feed import feed_queryset
+from .filters import RecipeFilter, RecipeOrderingFilter
+from .mixins import (AnonymousResponseCacheMixin, ConditionalCatalogueMixin,
+                     SparseFieldsetMixin)
+from .models import (FavoriteRecipe, Follow, Ingredient, Recipe, ShoppingCart,
+                     Tag)
+from .pagination import CustomPagination, FeedPagination
 from .permissions import AuthorPermission
+from .renderers import (ShoppingListCsvRenderer, ShoppingListPdfRenderer,
+                        ShoppingListTxtRenderer)
+from .search import ingredient_index
 from .serializers import (CreateRecipeSerializer, CustomUserSerializer,
                           FavoriteSerializer, IngredientsSerializer,
-                          RecipeReadSerializer, ShoppingCartSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
                           SubscribeListSerializer, TagsSerializer)
-from .utils import create_model_instance, delete_model_instance
+from .shopping_list import RENDERERS
+from .utils import (create_model_instance, create_model_instances,
+                    delete_model_instance, delete_model_instances,
+                    get_recipes_limit, get_recipes_preview)
+from .versions import AUTHORS, INGREDIENTS, RECIPES, TAGS, recipe_version
 
 User = get_user_model()
 
+SHOPPING_LIST_CHUNK_SIZE = 500
 
-class UserViewSet(UserViewSet):
+
+class UserViewSet(SparseFieldsetMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     pagination_class = CustomPagination
 
+    def get_available_fields(self):
+        if self.action == 'subscriptions':
+            return SubscribeListSerializer.Meta.fields
+        return super().get_available_fields()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        fields = self.get_requested_fields()
+        if user.is_authenticated and (
+            fields is None or 'is_subscribed' in fields
+        ):
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(user=user, author=OuterRef('pk'))
+                )
+            )
+        return queryset
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -47,91 +80,165 @@ class UserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             Follow.objects.create(user=user, author=author)
+            author.refresh_from_db(fields=['followers_count'])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return get_object_or_404(
             Follow, user=user, author=author).delete() and Response(
             status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, permission_classes=[IsAuthenticated])
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        limit = get_recipes_limit(request)
+        queryset = self.get_queryset().filter(following__user=user)
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeListSerializer(
-            pages, many=True, context={'request': request}
-        )
+        fields = self.get_requested_fields()
+        recipes_preview = None
+        if fields is None or 'recipes' in fields:
+            recipes_preview = get_recipes_preview(
+                [author.id for author in pages],
+                limit
+            )
+        serializer = self.prune_fields(SubscribeListSerializer(
+            pages,
+            many=True,
+            context={'request': request, 'recipes_preview': recipes_preview}
+        ))
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalCatalogueMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
 
+    catalogue_version = INGREDIENTS
     serializer_class = IngredientsSerializer
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny]
-    filter_backends = [IngredientFilter]
-    search_fields = ['^name']
     pagination_class = None
 
+    def get_object(self):
+        try:
+            ingredient = ingredient_index.get(int(self.kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return ingredient
+
+    def filter_queryset(self, queryset):
+        return ingredient_index.search(
+            self.request.query_params.get('name', '')
+        )
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalCatalogueMixin, viewsets.ModelViewSet):
     """Вьюсет тегов."""
 
+    catalogue_version = TAGS
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsetMixin, AnonymousResponseCacheMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет рецептов."""
 
-    queryset = Recipe.objects.select_related(
-        'author').prefetch_related('tags')
+    queryset = Recipe.objects.all()
     permission_classes = [AuthorPermission]
-    pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend]
+    pagination_class = FeedPagination
+    filter_backends = [DjangoFilterBackend, RecipeOrderingFilter]
     filterset_class = RecipeFilter
     serializer_class = CreateRecipeSerializer
+    response_cache_versions = (TAGS, INGREDIENTS, AUTHORS)
+
+    def get_queryset(self):
+        fields = self.get_requested_fields()
+        return super().get_queryset().with_details(fields).with_user_flags(
+            self.request.user, fields
+        )
+
+    def get_response_cache_versions(self):
+        if self.action == 'retrieve':
+            return (
+                *self.response_cache_versions,
+                recipe_version(self.kwargs['pk'])
+            )
+        return (*self.response_cache_versions, RECIPES)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return CreateRecipeSerializer
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, от новых к старым."""
+
+        queryset = self.filter_queryset(
+            feed_queryset(self.get_queryset(), request.user)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @staticmethod
-    def send_message(ingredients):
-        shopping_list = 'Список покупок:\n'
-        for ingredient in ingredients:
-            shopping_list += (
-                f"{ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']}) - "
-                f"{ingredient['amount']}\n"
-            )
-        response = HttpResponse(
-            shopping_list,
-            content_type='text/plain'
+    def send_message(ingredients, renderer):
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            RENDERERS[renderer.format](ingredients),
+            content_type=content_type
         )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename="shopping_list.txt"'
+        ] = f'attachment; filename="shopping_list.{renderer.format}"'
         return response
 
     @action(
         detail=False,
-        methods=['GET']
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTxtRenderer,
+            ShoppingListCsvRenderer,
+            ShoppingListPdfRenderer,
+        ]
     )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_list__user=request.user
-        ).order_by(
-            'ingredient__name'
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        return self.send_message(ingredients)
+        ingredients = request.user.shopping_list_items.values(
+            'name', 'measurement_unit', 'amount'
+        )
+        return self.send_message(
+            ingredients.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE),
+            request.accepted_renderer
+        )
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_summary(self, request):
+        """Список покупок в JSON: число рецептов и сложенные ингредиенты."""
+
+        return Response({
+            'recipes_count': request.user.shopping_list.count(),
+            'ingredients': ShoppingListItemSerializer(
+                request.user.shopping_list_items.all(), many=True
+            ).data,
+        })
 
     @action(
         detail=True,
@@ -175,3 +282,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
             recipe,
             error_message
         )
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        """Добавить в избранное или убрать из него несколько рецептов."""
+
+        return self.change_batch(request, FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        """Добавить в список покупок или убрать из него несколько рецептов."""
+
+        return self.change_batch(request, ShoppingCart)
+
+    @staticmethod
+    def change_batch(request, model_name):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return create_model_instances(request, model_name, recipe_ids)
+        return delete_model_instances(request, model_name, recipe_ids)
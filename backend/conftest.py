@@ -0,0 +1,9 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш не откатывается вместе с базой, поэтому чистится перед тестом."""
+
+    cache.clear()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,16 +69,95 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
+if os.getenv('USE_SQLITE', 'false').lower() == 'true':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'django'),
+            'USER': os.getenv('POSTGRES_USER', 'django'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432)
+        }
+    }
+
+# Реплика только для чтения: для SQLite достаточно REPLICA_DB_NAME (путь
+# к копии файла базы), для PostgreSQL — REPLICA_DB_HOST и REPLICA_DB_PORT.
+if os.getenv('REPLICA_DB_HOST') or os.getenv('REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('REPLICA_DB_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('REPLICA_DB_HOST', DATABASES['default'].get('HOST')),
+        'PORT': os.getenv('REPLICA_DB_PORT', DATABASES['default'].get('PORT')),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['api.replica.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index(
+            'django.contrib.auth.middleware.AuthenticationMiddleware'
+        ) + 1,
+        'api.replica.ReplicaMiddleware'
+    )
+
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Все воркеры должны видеть один кэш: в docker-compose это memcached.
+# Файловый кэш подходит только для одного процесса при разработке.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'django'),
-        'USER': os.getenv('POSTGRES_USER', 'django'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+        ),
     }
 }
+if 'memcached' not in CACHE_BACKEND:
+    # Memcached вытесняет записи сам; локальным кэшам нужен запас, чтобы
+    # версии и ответы не вытеснялись уже при 300 записях по умолчанию.
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+CATALOGUE_MAX_AGE = int(os.getenv('CATALOGUE_MAX_AGE', 300))
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+# Запросы дольше этого времени (секунды) пишутся в лог вместе с SQL.
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', 1))
+
+# Как часто (секунды) воркер переносит свои замеры в общий кэш.
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+
+# /metrics открыт сотрудникам и запросам с заголовком
+# Authorization: Bearer <токен>; без токена остальным — только при DEBUG.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Лента подписок: сколько рецептов хранить в ленте и с какого числа
+# подписчиков рецепты автора подмешиваются при чтении, а не раскладываются
+# по лентам при публикации.
+FEED_LENGTH = int(os.getenv('FEED_LENGTH', 500))
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+# Популярность рецептов: через сколько дней вклад добавления в избранное
+# или корзину уменьшается вдвое. После изменения нужен
+# manage.py update_popularity --full.
+POPULARITY_HALF_LIFE = float(os.getenv('POPULARITY_HALF_LIFE', 7))
+
+# Асинхронные представления для чтения и выгрузки; foodgram.asgi включает
+# их по умолчанию.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
 
 
 # Password validation
@@ -126,17 +207,29 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Способы аутентификации API; для развёртываний только с API достаточно
+# API_AUTHENTICATION=token.
+AUTHENTICATION_CLASSES = {
+    'token': 'api.authentication.CachedTokenAuthentication',
+    'basic': 'rest_framework.authentication.BasicAuthentication',
+    'session': 'rest_framework.authentication.SessionAuthentication',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        AUTHENTICATION_CLASSES[name.strip()]
+        for name in os.getenv(
+            'API_AUTHENTICATION', 'token, basic, session'
+        ).split(',')
     ],
 }
 
+# Сколько секунд токен и пользователь хранятся в кэше; 0 отключает кэш.
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+
 
 DJOSER = {
     'LOGIN_FIELD': 'email',
@@ -2,4 +2,9 @@ from django.contrib import admin
 
 from .models import CustomUser
 
-admin.site.register(CustomUser)
+
+class CustomUserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'email', 'recipes_count', 'followers_count')
+
+
+admin.site.register(CustomUser, CustomUserAdmin)
@@ -34,6 +34,18 @@ class CustomUser(AbstractUser):
         verbose_name='last_name',
     )
 
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='число рецептов',
+    )
+
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='число подписчиков',
+    )
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'пользователь'